@@ -0,0 +1,117 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from confluent_kafka import Producer
+import logging
+
+"""
+Batch producer module.
+Kafka producer that publishes whole batches of messages and keeps track of their delivery.
+"""
+
+# Time (in seconds) to wait for delivery reports when the local queue of the producer is full
+_BACKPRESSURE_POLL_TIMEOUT = 0.1
+
+
+class DeliveryReport:
+    """
+    Delivery report of one batch of messages. It is filled in by the delivery callbacks of the producer.
+    """
+
+    def __init__(self, topic, size):
+        """
+        :param topic: Kafka topic the batch was published to
+        :param size: Number of messages in the batch
+        """
+        self.topic = topic
+        self.size = size
+        self.delivered = 0
+        self.failed = 0
+        # Highest delivered offset, by partition
+        self.offsets = {}
+
+    def __call__(self, err, msg):
+        if err is None:
+            self.delivered += 1
+            partition = msg.partition()
+            self.offsets[partition] = max(self.offsets.get(partition, -1), msg.offset())
+        else:
+            self.failed += 1
+            logging.debug("Delivery failed on topic {}: {}".format(self.topic, err))
+
+    def done(self):
+        """All the messages of the batch have been delivered or have failed."""
+        return self.delivered + self.failed >= self.size
+
+
+class BatchProducer:
+    """
+    Kafka producer for batches of messages.
+
+    Messages are queued locally and sent by the client according to its linger, batch size and compression settings.
+    When the local queue is full, the producer waits for the broker instead of dropping the message.
+    """
+
+    def __init__(self, server, producer_config=None):
+        """
+        :param server: Kafka server IP address
+        :param producer_config: Additional Kafka producer settings, e.g. linger.ms, batch.num.messages, compression.type
+        """
+        conf = {'bootstrap.servers': server}
+        if producer_config:
+            conf.update(producer_config)
+        self.producer = Producer(conf)
+
+    def produce(self, topic, message, key=None, on_delivery=None):
+        """
+        Queue one message. Blocks while the local queue is full.
+
+        :param topic: Kafka topic
+        :param message: Message in byte format
+        :param key: Message key
+        :param on_delivery: Delivery callback
+        :return:
+        """
+        while True:
+            try:
+                self.producer.produce(topic, message, key=key, on_delivery=on_delivery)
+                return
+            except BufferError:
+                # Serve the delivery reports to make room in the queue
+                self.producer.poll(_BACKPRESSURE_POLL_TIMEOUT)
+
+    def send_batch(self, topic, messages, keys=None):
+        """
+        Queue a batch of messages and serve the delivery reports that are already available.
+
+        :param topic: Kafka topic
+        :param messages: Messages in byte format
+        :param keys: Message keys, one for each message
+        :return: DeliveryReport of the batch
+        """
+        report = DeliveryReport(topic, len(messages))
+        if keys is None:
+            keys = [None] * len(messages)
+        for message, key in zip(messages, keys):
+            self.produce(topic, message, key=key, on_delivery=report)
+        self.producer.poll(0)
+        return report
+
+    def poll(self, timeout=0):
+        return self.producer.poll(timeout)
+
+    def flush(self, timeout=None):
+        if timeout is None:
+            return self.producer.flush()
+        return self.producer.flush(timeout)
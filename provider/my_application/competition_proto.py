@@ -0,0 +1,181 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import re
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+from grpc_tools import protoc
+
+"""
+Competition proto module.
+Generation of the gRPC code of a competition at its creation: the .proto file of the competition (file.proto) and the
+batch protocol added by the platform (file_batch.proto), in the same package.
+
+The batch protocol delivers the records as batches: every MessageBatch holds the records of the stream that are
+available when it is sent, a whole released batch when the participant keeps up with the stream.
+
+The gRPC server loads the protocols from a descriptor set (file.desc), every competition in its own descriptor pool:
+the protocols of all the competitions are served by the same process, although their files have the same name.
+"""
+
+BATCH_PROTO_FILE = 'file_batch.proto'
+DESCRIPTOR_SET_FILE = 'file.desc'
+
+_BATCH_PROTO = '''syntax = "proto3";
+{package}
+import "file.proto";
+
+// Batch protocol, generated by the platform from file.proto
+service DataStreamerBatch {{
+  // Receives the predictions and sends the records of the stream in batches
+  rpc sendBatch (stream PredictionBatch) returns (stream MessageBatch) {{}}
+}}
+
+message MessageBatch {{
+    repeated Message messages = 1;
+}}
+
+message PredictionBatch {{
+    repeated Prediction predictions = 1;
+}}
+'''
+
+_PACKAGE = re.compile(r'^\s*package\s+[\w.]+\s*;', re.MULTILINE)
+
+
+def write_batch_proto(proto_directory):
+    """
+    Write the batch protocol of a competition next to its file.proto.
+
+    :param proto_directory: Directory of the .proto files of the competition
+    :return: Path to the batch .proto file
+    """
+    with open(os.path.join(proto_directory, 'file.proto')) as proto_file:
+        package = _PACKAGE.search(proto_file.read())
+    batch_proto_path = os.path.join(proto_directory, BATCH_PROTO_FILE)
+    with open(batch_proto_path, 'w') as batch_proto_file:
+        batch_proto_file.write(_BATCH_PROTO.format(package=package.group(0).strip() if package else ''))
+    return batch_proto_path
+
+
+def compile_competition_proto(proto_directory, generated_code_directory):
+    """
+    Generate the Python code of the protocol of a competition: file_pb2.py and file_pb2_grpc.py from file.proto,
+    file_batch_pb2.py and file_batch_pb2_grpc.py from the batch protocol.
+
+    :param proto_directory: Directory of the .proto files of the competition
+    :param generated_code_directory: Directory of the generated code
+    :return:
+    """
+    if not os.path.exists(generated_code_directory):
+        os.makedirs(generated_code_directory)
+    try:
+        with open(generated_code_directory + '/__init__.py', "w+") as f:
+            f.write('')
+    except Exception:
+        pass
+
+    protoc.main(('', '-I' + proto_directory, '--python_out=' + generated_code_directory,
+                 '--grpc_python_out=' + generated_code_directory,
+                 os.path.join(proto_directory, 'file.proto')))
+    batch_proto_path = write_batch_proto(proto_directory)
+    protoc.main(('', '-I' + proto_directory, '--python_out=' + generated_code_directory,
+                 '--grpc_python_out=' + generated_code_directory, batch_proto_path))
+    compile_descriptor_set(proto_directory, os.path.join(generated_code_directory, DESCRIPTOR_SET_FILE))
+
+
+def compile_descriptor_set(proto_directory, descriptor_set_path):
+    """
+    Compile the protocol of a competition into a descriptor set, with the batch protocol.
+
+    :param proto_directory: Directory of the .proto files of the competition
+    :param descriptor_set_path: Path to the descriptor set file
+    :return:
+    """
+    batch_proto_path = os.path.join(proto_directory, BATCH_PROTO_FILE)
+    if not os.path.exists(batch_proto_path):
+        write_batch_proto(proto_directory)
+    status = protoc.main(('', '-I' + proto_directory, '--include_imports',
+                          '--descriptor_set_out=' + descriptor_set_path,
+                          os.path.join(proto_directory, 'file.proto'), batch_proto_path))
+    if status != 0:
+        raise ValueError('The protocol in {} could not be compiled'.format(proto_directory))
+
+
+def load_competition_protocol(proto_directory, generated_code_directory):
+    """
+    Load the protocol of a competition. The descriptor set is compiled first for the competitions created before it
+    was generated with the code of the competition.
+
+    :param proto_directory: Directory of the .proto files of the competition
+    :param generated_code_directory: Directory of the generated code
+    :return: CompetitionProtocol
+    """
+    descriptor_set_path = os.path.join(generated_code_directory, DESCRIPTOR_SET_FILE)
+    if not os.path.exists(descriptor_set_path):
+        if not os.path.exists(generated_code_directory):
+            os.makedirs(generated_code_directory)
+        compile_descriptor_set(proto_directory, descriptor_set_path)
+    with open(descriptor_set_path, 'rb') as descriptor_set:
+        return CompetitionProtocol(descriptor_set.read())
+
+
+class CompetitionProtocol:
+    """
+    Messages and services of the protocol of a competition, in a descriptor pool of its own.
+    """
+
+    def __init__(self, descriptor_set):
+        """
+        :param descriptor_set: Serialized FileDescriptorSet of the protocol
+        """
+        self.pool = descriptor_pool.DescriptorPool()
+        self.files = []
+        for file_proto in descriptor_pb2.FileDescriptorSet.FromString(descriptor_set).file:
+            self.pool.Add(file_proto)
+            self.files.append(self.pool.FindFileByName(file_proto.name))
+        # Recent protobuf versions replace the message factories by GetMessageClass
+        self.factory = None
+        if not hasattr(message_factory, 'GetMessageClass'):
+            self.factory = message_factory.MessageFactory(self.pool)
+
+    def message_class(self, name):
+        """
+        Class of a message of the protocol.
+
+        :param name: Name of the message, without its package, e.g. 'Message'
+        :return: Message class
+        """
+        for file in self.files:
+            if name in file.message_types_by_name:
+                return self.descriptor_class(file.message_types_by_name[name])
+        raise KeyError(name)
+
+    def descriptor_class(self, descriptor):
+        """Class of the message of a descriptor of the protocol."""
+        if self.factory is None:
+            return message_factory.GetMessageClass(descriptor)
+        return self.factory.GetPrototype(descriptor)
+
+    def service(self, name):
+        """
+        Descriptor of a service of the protocol.
+
+        :param name: Name of the service, without its package, e.g. 'DataStreamer'
+        :return: Service descriptor, None if the protocol has no such service
+        """
+        for file in self.files:
+            if name in file.services_by_name:
+                return file.services_by_name[name]
+        return None
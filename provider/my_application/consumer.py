@@ -15,20 +15,19 @@
 
 
 from __future__ import absolute_import
-from confluent_kafka import Consumer, Producer
+import asyncio
 import grpc
 import os
 import orjson
 from repository import MongoRepository
-import imp
-from google.protobuf import json_format
 import datetime
-import time
-from bson import json_util
 import json
 import threading
-from subscription_auth import decode_subscription_token
-from repositories.CompetitionRepository import SubscriptionRepository, UserRepository, CompetitionRepository
+from competition_proto import load_competition_protocol
+from proto_codec import MessageCodec, repeated_messages
+from batch_producer import BatchProducer
+from stream_hub import StreamHub
+from stream_auth import StreamAuthenticator
 import logging
 
 logging.basicConfig(level='DEBUG')
@@ -57,86 +56,100 @@ except Exception:
 
 _UPLOAD_REPO = config['UPLOAD_REPO']
 _COMPETITION_GENERATED_CODE = config['COMPETITION_GENERATED_CODE']
+_COMPETITION_PROTO_REPO = config['COMPETITION_PROTO_REPO']
+# Maximum time (in seconds) a poll of the stream blocks without any message, the delay to notice a cancelled call
+_POLL_TIMEOUT = 0.5
+# Maximum number of records waiting to be sent to one participant
+_STREAM_QUEUE_SIZE = config.get('STREAM_QUEUE_SIZE', 10000)
+# Maximum number of records in one batch of the batch protocol
+_STREAM_BATCH_SIZE = config.get('STREAM_BATCH_SIZE', 1000)
+# Time to live (in seconds) and maximum number of the cached credential lookups
+_AUTH_CACHE_TTL = config.get('AUTH_CACHE_TTL', 60)
+_AUTH_CACHE_SIZE = config.get('AUTH_CACHE_SIZE', 10000)
+# Kafka producer settings for publishing the predictions: linger, batch size, compression...
+_PREDICTIONS_PRODUCER_CONFIG = config.get('KAFKA_PREDICTIONS_PRODUCER', {})
+
+
+def _batch_size(metadata):
+    """Size of the batches of the batch protocol, the user can ask for smaller batches than _STREAM_BATCH_SIZE."""
+    try:
+        return min(_STREAM_BATCH_SIZE, max(1, int(metadata['batch_size'])))
+    except (KeyError, ValueError):
+        return _STREAM_BATCH_SIZE
+
+
+def publish_predictions(request, competition_id, user_id, kafka_producer, spark_topic, targets, prediction_codec,
+                        batched=False):
+    """
+    Publish the predictions of one request of a user to the Kafka topic read by Spark, as one batch.
+
+    :param request: Prediction, or PredictionBatch if batched
+    :param competition_id: Competition ID
+    :param user_id: User ID
+    :param kafka_producer: BatchProducer
+    :param spark_topic: Kafka topic to publish in, so it would be read by Spark
+    :param targets: label columns
+    :param prediction_codec: MessageCodec of the predictions
+    :param batched: The request is a PredictionBatch
+    :return:
+    """
+    submitted_on = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    messages = []
+    for prediction in (request.predictions if batched else [request]):
+        document = prediction_codec.to_dict(prediction)
+        document['submitted_on'] = submitted_on
+        document['prediction_competition_id'] = competition_id
+        document['user_id'] = user_id
+        for target in targets:
+            document['prediction_' + target] = document[target]
+            del document[target]
+        messages.append(orjson.dumps(document))
+    kafka_producer.send_batch(spark_topic, messages, keys=[str(user_id)] * len(messages))
 
 
 def receive_predictions(predictions, competition_id, user_id, end_date, kafka_producer,
-                        spark_topic, targets, stop):
+                        spark_topic, targets, stop, prediction_codec, batched=False):
     """
     This function receives the predictions from the users and publishes them to a Kafka topic so they can be read by
     Spark module.
 
-    :param predictions: Batch predictions sent by user
+    The thread blocks on the predictions until the user sends one, and ends when the user closes its side of the call,
+    when the call is cancelled or terminated, or at the end of the competition. A prediction that can not be published
+    is logged and skipped, the next ones are still received. The predictions are queued in the producer of the
+    competition, which sends them in batches (linger) and reports the failed deliveries.
+
+    :param predictions: Predictions sent by user, one Prediction or one PredictionBatch at a time
     :param competition_id: Competition ID
     :param user_id: User ID
     :param end_date: Competition end date
-    :param kafka_producer: Kafka producer for a given user
+    :param kafka_producer: BatchProducer of the competition
     :param spark_topic: Kafka topic to publish in, so it would be read by Spark
     :param targets: label columns
     :param stop: Kill signal for the thread
+    :param prediction_codec: MessageCodec of the predictions
+    :param batched: The user sends PredictionBatch messages (batch protocol)
     :return:
     """
-
-    last_sent_message = datetime.datetime.now()
-    while True:
-        predictions._state.rpc_errors = []
-        try:
-            prediction = predictions.next()
-            document = orjson.loads(json_format.MessageToJson(prediction))
-            submitted_on = datetime.datetime.now()
-            document['submitted_on'] = submitted_on.strftime("%Y-%m-%d %H:%M:%S")
-            document['prediction_competition_id'] = competition_id
-            document['user_id'] = user_id
-            for target in targets:
-                document['prediction_' + target] = document[target]
-                del document[target]
-            kafka_producer.produce(spark_topic, orjson.dumps(document))
-            kafka_producer.poll(timeout=0)
-            last_sent_message = datetime.datetime.now()
-        except Exception as e:
-            pass
-
-        seconds_since_last_prediction = (datetime.datetime.now() - last_sent_message).total_seconds()
-        if seconds_since_last_prediction > 30:
-            logging.debug("Stop receiving")
-            break
-
-        if stop():
-            logging.debug("Kill Thread")
-            break
-
-        now = datetime.datetime.now()
-        if now > end_date:
-            break
-
-
-class ProducerToMongoSink:
-    """
-    Kafka producer.
-
-    Publishes messages to a given topic.
-
-    """
-    daemon = True
-    producer = None
-
-    def __init__(self, kafka_server):
-        conf = {'bootstrap.servers': kafka_server}
-        self.producer = Producer(conf)
-
-    # message must be in byte format
-    def send(self, topic, prediction):
-        """
-        Publish messages to a given topic in byte format.
-
-        :param topic: Kafka topic
-        :param prediction: data
-        :return:
-        """
-        try:
-            self.producer.produce(topic, orjson.dumps(prediction))
-            self.producer.poll(0)
-        except Exception as e:
-            print(e)
+    try:
+        for request in predictions:
+            try:
+                publish_predictions(request, competition_id, user_id, kafka_producer, spark_topic, targets,
+                                    prediction_codec, batched)
+            except Exception as e:
+                logging.debug("Prediction of user {} not published: {}".format(user_id, e))
+            if stop():
+                logging.debug("Kill Thread")
+                break
+            if datetime.datetime.now() > end_date:
+                break
+    except grpc.RpcError:
+        # The call has been cancelled or terminated
+        pass
+    except Exception as e:
+        logging.debug("Stop receiving: {}".format(e))
+    logging.debug("Stop receiving")
+    # Serve the delivery reports of the last predictions
+    kafka_producer.poll(0)
 
 
 class DataStreamerServicer:
@@ -148,7 +161,7 @@ class DataStreamerServicer:
     from .proto file.
 
     """
-    def __init__(self, server, competition, competition_config):
+    def __init__(self, server, competition, competition_config, authenticator=None, worker=0):
         """
         Construct the DatastreamServicer Class. Once the communication is triggered by the user, it starts publishing
         messages to be sent to that user and at the same time activates module for receiving the predictions.
@@ -156,13 +169,15 @@ class DataStreamerServicer:
         :param server: Kafka server IP address
         :param competition: Competition object
         :param competition_config: Competition configuration object
+        :param authenticator: StreamAuthenticator shared by the servicers of the process
+        :param worker: Slot of the gRPC server worker, it names the consumer group of the stream
         """
         self.server = server
-        self.producer = ProducerToMongoSink(server)
-        self.predictions_producer = ProducerToMongoSink(server)
-        conf_producer = {'bootstrap.servers': server}
-        self.kafka_producer = Producer(conf_producer)
-        self.consumers_dict = {}
+        if authenticator is None:
+            authenticator = StreamAuthenticator(_SQL_HOST, _SQL_DBNAME, _AUTH_CACHE_TTL, _AUTH_CACHE_SIZE)
+        self.authenticator = authenticator
+        # One producer for the predictions of all the users of the competition, they are sent in batches
+        self.kafka_producer = BatchProducer(server, _PREDICTIONS_PRODUCER_CONFIG)
 
         self.repo = MongoRepository(_MONGO_HOST)
         self.competition = competition
@@ -174,27 +189,25 @@ class DataStreamerServicer:
         self.spark_topic = competition.name.lower().replace(" ", "") + 'predictions'
 
         try:
-            # create data_object dictionary with following fields: competition_id, dataset
-            data_object = {}
-            data_object['competition_id'] = str(self.competition.competition_id)
-            data_object['dataset'] = []
-            # Insert document in mongo repository with db name: data, collection name: data
-            self.repo.insert_document('data', 'data', data_object)
+            # Data document with the following fields: competition_id, dataset. It is created once, whichever worker
+            # serves the competition first
+            self.repo.create_competition_data(self.competition.competition_id)
         except Exception as e:
-            pass
-
-        # Import the right gRPC module
-        # file_path: ../local/data/uploads/competition_generated_code/competition_name -> file_pb2.py
-        pb2_file_path = os.path.join(_UPLOAD_REPO, _COMPETITION_GENERATED_CODE, self.competition.name, 'file_pb2.py')
-        # grpc file path: ../local/data/uploads/competition_generated_code/competition_name -> file_pb2_grpc.py
-        pb2_grpc_file_path = os.path.join(_UPLOAD_REPO, _COMPETITION_GENERATED_CODE, self.competition.name,
-                                          'file_pb2_grpc.py')
-        # import parent modules
-        self.file_pb2 = imp.load_source('file_pb2', pb2_file_path)
-        self.file_pb2_grpc = imp.load_source('file_pb2_grpc', pb2_grpc_file_path)
-        # import classes
-        self.DataStreamer = imp.load_source('file_pb2_grpc.DataStreamerServicer', pb2_grpc_file_path)
-        self.Message = imp.load_source('file_pb2.Message', pb2_file_path)
+            logging.debug("Data document of competition {} not created: {}".format(self.competition.competition_id, e))
+
+        # Load the protocol of the competition
+        # proto directory: ../local/data/uploads/competition_proto/competition_name -> file.proto
+        # generated code: ../local/data/uploads/competition_generated_code/competition_name -> file.desc
+        self.protocol = load_competition_protocol(
+            os.path.join(_UPLOAD_REPO, _COMPETITION_PROTO_REPO, self.competition.name),
+            os.path.join(_UPLOAD_REPO, _COMPETITION_GENERATED_CODE, self.competition.name))
+        # The stream publishes typed values, numbers are sent as text in the string fields of the message
+        self.message_codec = MessageCodec(self.protocol.message_class('Message'))
+        self.prediction_codec = MessageCodec(self.protocol.message_class('Prediction'))
+        self.end_date = competition.end_date + 5 * datetime.timedelta(seconds=competition.predictions_time_interval)
+        # The stream is read and encoded once, and sent to all the participants connected to this server
+        self.hub = StreamHub(server, self.input_topic, _STREAM_QUEUE_SIZE, _POLL_TIMEOUT, encode=self.encode_record,
+                             worker=worker)
 
         self.targets = []
 
@@ -202,59 +215,69 @@ class DataStreamerServicer:
             y = str(key).replace(' ', '')  # Key
             self.targets.append(y)
 
-        self.__bases__ = (self.DataStreamer,)  # ??
 
-    def sendData(self, request_iterator, context):
+    def close(self):
+        """Stop reading the stream and deliver the predictions that are still queued, once the competition is over."""
+        self.hub.close()
+        self.kafka_producer.flush()
+
+    def encode_record(self, record):
         """
-        After the user has initialized the communication with the server. It checks user's credentials and
-        starts sending the data records.
-        :param request_iterator: Sent by the user through gRPC/Protobuf protocol
-        :param context: data
-        :return:
+        Convert a record of the stream to a serialized protobuf Message. It is done once for every record, the same
+        bytes are sent to all the users.
+
+        :param record: Record of the stream, json in byte format
+        :return: Serialized Message
+        """
+        return self.message_codec.parse(orjson.loads(record)).SerializeToString()
+
+    def authenticate(self, context):
+        """
+        Check the credentials of the user that initialized the communication with the server.
+
+        :param context: Context of the call
+        :return: User, or None if the user is not allowed to receive the stream (the status of the call is set)
+        """
+        user, code, details = self.check_credentials(dict(context.invocation_metadata()))
+        if user is None:
+            context.set_code(code)
+            context.set_details(details)
+        return user
+
+    def check_credentials(self, metadata):
+        """
+        Check the credentials sent as call metadata: the user, the competition, the subscription and the secret token.
+
+        :param metadata: Call metadata dictionary
+        :return: User, status code and details of the error. The user is None if it is not allowed to receive the
+        stream
         """
-        _SUBSCRIPTION_REPO = SubscriptionRepository(_SQL_HOST, _SQL_DBNAME)
-        _USER_REPO = UserRepository(_SQL_HOST, _SQL_DBNAME)
-        _COMPETITION_REPO = CompetitionRepository(_SQL_HOST, _SQL_DBNAME)
-        metadata = context.invocation_metadata()
-        metadata = dict(metadata)
         token = metadata['authorization']
 
         user_id = metadata['user_id']
         competition_code = metadata['competition_id']
 
-        user = _USER_REPO.get_user_by_email(user_id)
-        _USER_REPO.cleanup()
+        user = self.authenticator.user(user_id)
         if user is None:
-            context.set_code(grpc.StatusCode.PERMISSION_DENIED)
-            context.set_details('You are not registered, please register on the website')
-            return self.file_pb2.Message()
+            return None, grpc.StatusCode.PERMISSION_DENIED, 'You are not registered, please register on the website'
 
-        competition = _COMPETITION_REPO.get_competition_by_code(competition_code)
-        _COMPETITION_REPO.cleanup()
+        competition = self.authenticator.competition(competition_code)
         if competition is None:
-            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-            context.set_details('Unknown competition, please refer to the website')
-            return self.file_pb2.Message()
+            return None, grpc.StatusCode.INVALID_ARGUMENT, 'Unknown competition, please refer to the website'
 
         # TODO : for Subscription Data
-        subscription = _SUBSCRIPTION_REPO.get_subscription(competition.competition_id, user.user_id)
-        _SUBSCRIPTION_REPO.cleanup()
+        subscription = self.authenticator.subscription(competition.competition_id, user.user_id)
         if subscription is None:
             # TODO : Should close connection
-            context.set_code(grpc.StatusCode.PERMISSION_DENIED)
-            context.set_details('You are not allowed to participate, please subscribe to the competition on website')
-            return self.file_pb2.Message()
+            return None, grpc.StatusCode.PERMISSION_DENIED, \
+                'You are not allowed to participate, please subscribe to the competition on website'
 
         # TODO : check secret token
-        decoded_token = decode_subscription_token(token)
+        decoded_token = self.authenticator.decode_token(token)
         if decoded_token is None:
             print('Wrong token')
             # TODO : should close connection
-            context.set_code(grpc.StatusCode.UNAUTHENTICATED)
-            context.set_details('Please check your authentication credentials, Wrong Token!')
-            return self.file_pb2.Message()
-
-        decoded_token = decoded_token[1]
+            return None, grpc.StatusCode.UNAUTHENTICATED, 'Please check your authentication credentials, Wrong Token!'
 
         token_competition_id = decoded_token['competition_id']
         token_user_id = decoded_token['user_id']
@@ -262,20 +285,68 @@ class DataStreamerServicer:
         if int(token_competition_id) != int(competition.competition_id) or token_user_id != user_id:
             # TODO : should close channel
             print('Using wrong token for this competition')
-            context.set_code(grpc.StatusCode.UNAUTHENTICATED)
-            context.set_details('Please check your authentication token, the secret key does not match')
-            return self.file_pb2.Message()
+            return None, grpc.StatusCode.UNAUTHENTICATED, \
+                'Please check your authentication token, the secret key does not match'
+
+        return user, None, None
+
+    def sendData(self, request_iterator, context):
+        """
+        After the user has initialized the communication with the server. It checks user's credentials and
+        starts sending the data records.
+        :param request_iterator: Sent by the user through gRPC/Protobuf protocol
+        :param context: data
+        :return:
+        """
+        user = self.authenticate(context)
+        if user is None:
+            return
+        # Every message is sent as soon as the previous one has been sent: the flow control of gRPC blocks the
+        # stream while the user does not read the messages
+        for message in self.stream(request_iterator, context, user,
+                                   lambda subscription: subscription.get(timeout=_POLL_TIMEOUT)):
+            yield message
+
+    def sendBatch(self, request_iterator, context):
+        """
+        Batch protocol: same as sendData, the records are sent in batches (MessageBatch). Every batch holds the records
+        that are waiting to be sent, up to the batch size. The user sends the predictions in batches (PredictionBatch).
+
+        The user can lower the batch size with the batch_size call metadata.
+        :param request_iterator: Sent by the user through gRPC/Protobuf protocol
+        :param context: data
+        :return:
+        """
+        user = self.authenticate(context)
+        if user is None:
+            return
+        batch_size = _batch_size(dict(context.invocation_metadata()))
+
+        def next_batch(subscription):
+            messages = subscription.get_many(batch_size, timeout=_POLL_TIMEOUT)
+            if messages:
+                return repeated_messages(messages)
+            return None
+
+        for batch in self.stream(request_iterator, context, user, next_batch, batched=True):
+            yield batch
 
-        end_date = self.competition.end_date + 5 * datetime.timedelta(seconds=self.competition.predictions_time_interval)
+    def stream(self, request_iterator, context, user, next_message, batched=False):
+        """
+        Send the stream to an authenticated user and receive the predictions of the user, until the end of the
+        competition or until the call is cancelled.
+
+        :param request_iterator: Predictions sent by the user
+        :param context: Context of the call
+        :param user: User
+        :param next_message: Takes the next serialized message from the subscription to the stream, None if there is
+        no message before the poll timeout
+        :param batched: The user sends the predictions in batches (PredictionBatch)
+        :return: Generator over the serialized messages
+        """
+        end_date = self.end_date
 
-        if user_id in self.consumers_dict:
-            consumer = self.consumers_dict[user_id]
-        else:
-            consumer = Consumer({'group.id': user_id, 'bootstrap.servers': self.server,
-                                 'session.timeout.ms': competition.initial_training_time * 10000,
-                                 'auto.offset.reset': 'latest'})  # 172.22.0.2:9092
-            consumer.subscribe([self.input_topic])
-            self.consumers_dict[user_id] = consumer
+        subscription = self.hub.subscribe()
 
         try:
             stop_thread = False
@@ -284,32 +355,146 @@ class DataStreamerServicer:
                                          'competition_id': self.competition.competition_id, 'user_id': user.user_id,
                                          'end_date': end_date, 'kafka_producer': self.kafka_producer,
                                          'spark_topic': self.spark_topic, 'targets': self.targets,
-                                         'stop': lambda: stop_thread})
+                                         'stop': lambda: stop_thread,
+                                         'prediction_codec': self.prediction_codec, 'batched': batched})
             # use default name
+            t.daemon = True
             t.start()
         except Exception as e:
             print(str(e))
 
-        while context.is_active():
-            message = consumer.poll(timeout=0)
-            if message is None:
-                continue
-            else:
-                try:
-                    values = orjson.loads(message.value())
-                    json_string = json.dumps(values, default=json_util.default)
-                    message = self.file_pb2.Message()
-                    final_message = json_format.Parse(json_string, message, ignore_unknown_fields=True)
-                    time.sleep(0.01)
+        try:
+            while context.is_active():
+                # Blocks until a record is available: an idle stream does not use the CPU, and a record is sent as
+                # soon as it is received
+                message = next_message(subscription)
+                if message is not None:
                     if context.is_active():
                         yield message
                     else:
                         break
-                except Exception as e:
-                    pass
 
-            if datetime.datetime.now() > end_date:
-                break
+                if datetime.datetime.now() > end_date:
+                    break
+        finally:
+            # Also when the call is cancelled while a record is being sent
+            self.hub.unsubscribe(subscription)
         logging.debug("disconnect")
+        # The thread is not joined: it waits for the next prediction of the user, and it ends once the call is over
         stop_thread = True
-        t.join()
+
+
+class AsyncDataStreamerServicer(DataStreamerServicer):
+    """
+    DataStreamerServicer for the asyncio gRPC server (grpc.aio).
+
+    Both halves of the session of a user, sending the records and receiving the predictions, are coroutines on the
+    event loop of the server: a connected user does not hold any thread. The calls that may block, checking the
+    credentials and publishing the predictions, are run by the default executor.
+    """
+
+    async def authenticate_async(self, context):
+        """
+        Coroutine version of authenticate. The credentials are checked in the database by a thread of the default
+        executor, the event loop is not blocked.
+
+        :param context: Context of the call
+        :return: User, or None if the user is not allowed to receive the stream (the status of the call is set)
+        """
+        metadata = dict(context.invocation_metadata())
+        user, code, details = await asyncio.get_running_loop().run_in_executor(None, self.check_credentials, metadata)
+        if user is None:
+            context.set_code(code)
+            context.set_details(details)
+        return user
+
+    async def sendData(self, request_iterator, context):
+        """
+        Coroutine version of DataStreamerServicer.sendData.
+        :param request_iterator: Sent by the user through gRPC/Protobuf protocol
+        :param context: data
+        :return:
+        """
+        user = await self.authenticate_async(context)
+        if user is None:
+            return
+        async for message in self.stream_async(request_iterator, context, user,
+                                               lambda subscription: subscription.get_async(timeout=_POLL_TIMEOUT)):
+            yield message
+
+    async def sendBatch(self, request_iterator, context):
+        """
+        Coroutine version of DataStreamerServicer.sendBatch.
+        :param request_iterator: Sent by the user through gRPC/Protobuf protocol
+        :param context: data
+        :return:
+        """
+        user = await self.authenticate_async(context)
+        if user is None:
+            return
+        batch_size = _batch_size(dict(context.invocation_metadata()))
+
+        async def next_batch(subscription):
+            messages = await subscription.get_many_async(batch_size, timeout=_POLL_TIMEOUT)
+            if messages:
+                return repeated_messages(messages)
+            return None
+
+        async for batch in self.stream_async(request_iterator, context, user, next_batch, batched=True):
+            yield batch
+
+    async def receive_async(self, request_iterator, user, end_date, batched):
+        """
+        Receive the predictions of a user, until the user stops sending them or until the end of the competition. A
+        prediction that can not be published is logged and skipped, the next ones are still received.
+
+        :param request_iterator: Predictions sent by the user
+        :param user: User
+        :param end_date: Competition end date
+        :param batched: The user sends the predictions in batches (PredictionBatch)
+        :return:
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            async for request in request_iterator:
+                try:
+                    # The producer may block while its queue is full, the predictions are published by a thread of
+                    # the default executor so the event loop keeps serving the other users
+                    await loop.run_in_executor(None, publish_predictions, request, self.competition.competition_id,
+                                               user.user_id, self.kafka_producer, self.spark_topic, self.targets,
+                                               self.prediction_codec, batched)
+                except Exception as e:
+                    logging.debug("Prediction of user {} not published: {}".format(user.user_id, e))
+                if datetime.datetime.now() > end_date:
+                    break
+        except grpc.RpcError:
+            # The call has been cancelled or terminated
+            pass
+        except Exception as e:
+            logging.debug("Stop receiving: {}".format(e))
+
+    async def stream_async(self, request_iterator, context, user, next_message, batched=False):
+        """
+        Coroutine version of DataStreamerServicer.stream, the predictions are received by a concurrent task.
+
+        :param request_iterator: Predictions sent by the user
+        :param context: Context of the call
+        :param user: User
+        :param next_message: Coroutine function, takes the next serialized message from the subscription
+        :param batched: The user sends the predictions in batches (PredictionBatch)
+        :return: Asynchronous generator over the serialized messages
+        """
+        end_date = self.end_date
+
+        subscription = self.hub.subscribe(loop=asyncio.get_running_loop())
+        receiver = asyncio.ensure_future(self.receive_async(request_iterator, user, end_date, batched))
+        try:
+            # The call is cancelled when the user disconnects
+            while datetime.datetime.now() <= end_date:
+                message = await next_message(subscription)
+                if message is not None:
+                    yield message
+        finally:
+            self.hub.unsubscribe(subscription)
+            receiver.cancel()
+        logging.debug("disconnect")
@@ -0,0 +1,285 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bz2
+import csv
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import mmap
+import os
+from array import array
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import zstandard
+
+"""
+Datastream cache module.
+The datastream file is compiled once, when it is uploaded, into an Arrow IPC (Feather V2) file that can be
+memory-mapped by every competition that uses the datastream, so the .csv file does not have to be parsed again when a
+competition starts.
+
+The compiled datastream is columnar: the rows are stored in record batches, with one array per column, and the
+producer converts a whole record batch at a time. The columns are stored with the types given by the profile of the
+datastream, so the values are converted once, when the file is compiled. Rows that have no value at all, or that do
+not have as many values as the header, are left out, as the producer leaves them out of the stream. The cache files
+are named after the content hash of the original file, so the same file uploaded twice shares one cache.
+
+An uncompressed .csv file is also indexed: the row index holds the byte offset of every row in the file, the header
+excluded, followed by the size of the file. With the index, row ranges of the file can be read directly when the file
+has not been compiled.
+"""
+
+with open('config.json') as json_data_file:
+    config = json.load(json_data_file)
+
+_UPLOAD_REPO = config['UPLOAD_REPO']
+_DATASTREAM_CACHE = config['DATASTREAM_CACHE']
+
+# Compressed .csv files are decoded on the fly: .csv.gz, .csv.bz2, .csv.zst
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.zst')
+
+_HASH_BLOCK_SIZE = 1 << 20
+# Size of the blocks scanned for row boundaries
+_INDEX_BLOCK_SIZE = 1 << 26
+# Size of the blocks of the .csv file parsed at once, a record batch of the compiled datastream holds one block
+_PARSE_BLOCK_SIZE = 1 << 22
+_NEWLINE = ord('\n')
+# Arrow types of the numeric profile types, the other columns are stored as strings
+_PROFILE_TYPES = {'integer': pa.int64(), 'float': pa.float64()}
+_QUOTECHAR = ord('|')
+
+
+def file_content_hash(file_path):
+    """
+    Compute the content hash of a file.
+
+    :param file_path: Path to the file
+    :return: Hex digest of the SHA-256 of the file content
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def open_datastream_file(file_path):
+    """
+    Open a .csv datastream file for reading as text. Compressed files are decompressed incrementally while they are
+    read, they are never inflated on disk.
+
+    :param file_path: Path to the .csv, .csv.gz, .csv.bz2 or .csv.zst file
+    :return: Text file object
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.gz':
+        return gzip.open(file_path, 'rt')
+    if extension == '.bz2':
+        return bz2.open(file_path, 'rt')
+    if extension == '.zst':
+        raw = open(file_path, 'rb')
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+    return open(file_path, 'r')
+
+
+def cache_path(content_hash):
+    """
+    Path of the compiled datastream for a given content hash:
+    ../local/data/uploads/datastream_cache/<content_hash>.arrow
+
+    :param content_hash: Content hash of the datastream file
+    :return: Path to the compiled datastream
+    """
+    return os.path.join(_UPLOAD_REPO, _DATASTREAM_CACHE, content_hash + '.arrow')
+
+
+def index_path(content_hash):
+    """
+    Path of the row index for a given content hash: ../local/data/uploads/datastream_cache/<content_hash>.idx
+
+    :param content_hash: Content hash of the datastream file
+    :return: Path to the row index file
+    """
+    return os.path.join(_UPLOAD_REPO, _DATASTREAM_CACHE, content_hash + '.idx')
+
+
+def index_datastream(file_path, content_hash):
+    """
+    Build the row index of an uncompressed .csv datastream file. The file is memory-mapped and scanned for line ends
+    one block at a time. Files that are compressed, or that use the quote character (a quoted field can hold a line
+    end), are not indexed.
+
+    :param file_path: Path to the .csv file
+    :param content_hash: Content hash of the file
+    :return: Row index as an array of byte offsets, None if the file cannot be indexed
+    """
+    path = index_path(content_hash)
+    if os.path.exists(path):
+        return load_row_index(content_hash)
+    if os.path.splitext(file_path)[1].lower() in COMPRESSED_EXTENSIONS:
+        return None
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return None
+
+    ends = []
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for block_start in range(0, size, _INDEX_BLOCK_SIZE):
+            block = np.frombuffer(data, dtype=np.uint8, count=min(_INDEX_BLOCK_SIZE, size - block_start),
+                                  offset=block_start)
+            quoted = (block == _QUOTECHAR).any()
+            if not quoted:
+                ends.append(np.flatnonzero(block == _NEWLINE) + (block_start + 1))
+            # The block is a view on the memory map, it has to be released before the map is closed
+            del block
+            if quoted:
+                return None
+    # The first line end closes the header, the next ones close the rows
+    row_index = np.concatenate(ends).astype(np.uint64)
+    if len(row_index) == 0 or row_index[-1] != size:
+        # The last row has no line end
+        row_index = np.append(row_index, np.uint64(size))
+
+    directory = os.path.dirname(path)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+    row_index.tofile(tmp_path)
+    os.replace(tmp_path, path)
+    return load_row_index(content_hash)
+
+
+def load_row_index(content_hash):
+    """
+    Load the row index of a datastream file.
+
+    :param content_hash: Content hash of the datastream file
+    :return: Row index as an array of byte offsets, the first one being the offset of the first row after the header
+    and the last one the size of the file. None if the file has not been indexed
+    """
+    path = index_path(content_hash)
+    if not os.path.exists(path):
+        return None
+    row_index = array('Q')
+    with open(path, 'rb') as f:
+        row_index.frombytes(f.read())
+    return row_index
+
+
+def read_csv_rows(file_path, row_index, start=0, stop=None):
+    """
+    Generator over a range of rows of an indexed .csv file. The file is read from the offset of the first row, the
+    rows before it are not parsed.
+
+    :param file_path: Path to the .csv file
+    :param row_index: Row index of the file
+    :param start: Index of the first row, 0 being the first row after the header
+    :param stop: Index after the last row, defaults to the end of the file
+    :return: Rows as lists of strings
+    """
+    nb_rows = len(row_index) - 1
+    if stop is None or stop > nb_rows:
+        stop = nb_rows
+    if start >= stop:
+        return
+    with open(file_path, 'r') as csvfile:
+        # Rows start on a line, the byte offset is a valid position in the decoded file
+        csvfile.seek(row_index[start])
+        datareader = csv.reader(csvfile, delimiter=',', quotechar='|')
+        for row in itertools.islice(datareader, stop - start):
+            yield row
+
+
+def _skip_row(row):
+    """Rows that do not have as many values as the header are left out of the compiled datastream."""
+    return 'skip'
+
+
+def _rows_with_values(record_batch):
+    """
+    Rows of a record batch that have at least one value, the empty rows are left out of the compiled datastream.
+
+    :param record_batch: Record batch parsed from the .csv file
+    :return: Record batch without its empty rows
+    """
+    mask = None
+    for column in record_batch.columns:
+        if pa.types.is_string(column.type):
+            present = pc.fill_null(pc.not_equal(column, ''), False)
+        else:
+            present = pc.is_valid(column)
+        mask = present if mask is None else pc.or_(mask, present)
+    if mask is None or pc.all(mask).as_py():
+        return record_batch
+    return record_batch.filter(mask)
+
+
+def column_types(profile, names):
+    """
+    Arrow types of the columns of a .csv datastream, given by its profile.
+
+    :param profile: Profile of the datastream, None if it has not been profiled
+    :param names: Column names, as in the header of the file
+    :return: Dictionary with the Arrow type of every column, the columns that are not numbers are strings
+    """
+    columns = profile.get('columns', {}) if profile is not None else {}
+    return {name: _PROFILE_TYPES.get(columns.get(name.replace(' ', ''), {}).get('type'), pa.string()) for name in names}
+
+
+def compile_datastream(file_path, content_hash, profile=None):
+    """
+    Compile a (possibly compressed) .csv datastream file into an Arrow IPC file. Does nothing if it has already been
+    compiled. The file is written to a temporary file first and renamed when complete, so readers never see a partial
+    file.
+
+    The file is indexed first. It is then parsed one block at a time, the blocks being parsed and converted by the
+    threads of Arrow, and every block is written as a record batch: the memory used does not depend on the size of the
+    file.
+
+    :param file_path: Path to the .csv file, or to the compressed .csv file
+    :param content_hash: Content hash of the file
+    :param profile: Profile of the datastream, the numeric columns are stored as numbers. Without a profile, every
+    column is stored as strings
+    :return: Path to the compiled datastream
+    """
+    path = cache_path(content_hash)
+    if os.path.exists(path):
+        return path
+    directory = os.path.dirname(path)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    index_datastream(file_path, content_hash)
+
+    parse_options = pa_csv.ParseOptions(quote_char='|', invalid_row_handler=_skip_row)
+    read_options = pa_csv.ReadOptions(block_size=_PARSE_BLOCK_SIZE)
+    # The string columns are written as they are in the file, empty values of the numeric columns are missing values
+    with pa.input_stream(file_path, compression='detect') as source:
+        names = pa_csv.open_csv(source, read_options=read_options, parse_options=parse_options).schema.names
+    convert_options = pa_csv.ConvertOptions(column_types=column_types(profile, names), null_values=[''],
+                                            strings_can_be_null=False)
+
+    tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with pa.input_stream(file_path, compression='detect') as source:
+        reader = pa_csv.open_csv(source, read_options=read_options, parse_options=parse_options,
+                                 convert_options=convert_options)
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, reader.schema) as writer:
+            for record_batch in reader:
+                writer.write_batch(_rows_with_values(record_batch))
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,148 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from skmultiflow.data import SEAGenerator, HyperplaneGenerator, RandomRBFGeneratorDrift
+
+"""
+Datastream generator module.
+Synthetic datastreams: instead of a file, the datastream is a scikit-multiflow stream generator that is sampled by the
+producer one batch at a time. The stream does no I/O and can be unbounded.
+
+The generator is described by a specification, stored as a .gen (json) file in place of the datastream file:
+    {"generator": "SEA" | "Hyperplane" | "RandomRBFDrift",
+     "params": {<parameters of the scikit-multiflow generator>},
+     "seed": <seed of the random generators of the stream>,
+     "n_samples": <number of rows, unbounded if missing or null>,
+     "target": <name of the target column, "target" by default>}
+
+Streams with the same specification are identical, so a stream can be resumed by sampling again its first rows.
+"""
+
+GENERATORS = {'SEA': SEAGenerator, 'Hyperplane': HyperplaneGenerator, 'RandomRBFDrift': RandomRBFGeneratorDrift}
+
+# Parameters of the generators that take the seed
+_SEED_PARAMS = {'SEA': ['random_state'], 'Hyperplane': ['random_state'],
+                'RandomRBFDrift': ['model_random_state', 'sample_random_state']}
+
+# Number of rows sampled at once when the stream is sampled up to a given row
+_SKIP_SAMPLE_SIZE = 10000
+
+
+def load_generator_spec(file_path):
+    """
+    Load and validate the specification of a generator.
+
+    :param file_path: Path to the .gen file
+    :return: Specification dictionary
+    """
+    with open(file_path) as spec_file:
+        spec = json.load(spec_file)
+    validate_generator_spec(spec)
+    return spec
+
+
+def validate_generator_spec(spec):
+    """
+    Check that a generator can be created from a specification.
+
+    :param spec: Specification dictionary
+    :return: None, raises ValueError if the specification is not valid
+    """
+    if not isinstance(spec, dict) or spec.get('generator') not in GENERATORS:
+        raise ValueError('Unknown generator, expected one of: ' + ', '.join(sorted(GENERATORS)))
+    n_samples = spec.get('n_samples')
+    # bool is a subclass of int, true and false are not numbers of rows
+    if n_samples is not None and (not isinstance(n_samples, int) or isinstance(n_samples, bool) or n_samples < 1):
+        raise ValueError('n_samples should be a positive integer (at least 1), or null for an unbounded stream')
+    try:
+        create_generator(spec)
+    except TypeError as e:
+        raise ValueError('Invalid generator parameters: ' + str(e))
+
+
+def create_generator(spec):
+    """
+    Create the scikit-multiflow generator of a specification.
+
+    :param spec: Specification dictionary
+    :return: Stream generator, ready to be sampled
+    """
+    name = spec['generator']
+    params = dict(spec.get('params') or {})
+    if spec.get('seed') is not None:
+        for param in _SEED_PARAMS[name]:
+            params.setdefault(param, spec['seed'])
+    stream = GENERATORS[name](**params)
+    if hasattr(stream, 'prepare_for_use'):
+        stream.prepare_for_use()
+    return stream
+
+
+def generator_columns(spec, stream):
+    """
+    Column names of a generated datastream: the features, then the target.
+
+    :param spec: Specification dictionary
+    :param stream: Stream generator of the specification
+    :return: List of column names
+    """
+    return list(stream.feature_names) + [spec.get('target') or 'target']
+
+
+def generate_rows(spec, start=0, sample_size=1):
+    """
+    Generator over the rows of a generated datastream. The stream is sampled sample_size rows at a time, when the
+    rows are consumed.
+
+    :param spec: Specification dictionary
+    :param start: Index of the first row, the rows before it are sampled and discarded
+    :param sample_size: Number of rows sampled at once
+    :return: Header first, then every row as a list of the feature values and the target (class) value
+    """
+    stream = create_generator(spec)
+    yield generator_columns(spec, stream)
+    n_samples = spec.get('n_samples')
+    sample_size = max(1, sample_size)
+    while start > 0:
+        skipped = min(start, _SKIP_SAMPLE_SIZE)
+        stream.next_sample(skipped)
+        start -= skipped
+        if n_samples is not None:
+            n_samples -= skipped
+    while n_samples is None or n_samples > 0:
+        size = sample_size if n_samples is None else min(sample_size, n_samples)
+        X, y = stream.next_sample(size)
+        for features, target in zip(X.tolist(), y.tolist()):
+            yield features + [int(target)]
+        if n_samples is not None:
+            n_samples -= size
+
+
+def generator_profile(spec):
+    """
+    Profile of a generated datastream, known from its specification without sampling the stream.
+
+    :param spec: Specification dictionary
+    :return: Profile dictionary, the row count is None if the stream is unbounded
+    """
+    stream = create_generator(spec)
+    columns = generator_columns(spec, stream)
+    profile = {'row_count': spec.get('n_samples'), 'columns': {}}
+    for name in columns[:-1]:
+        profile['columns'][name.replace(' ', '')] = {'type': 'float', 'cardinality': None, 'classes': None}
+    classes = sorted(int(value) for value in stream.target_values)
+    profile['columns'][columns[-1].replace(' ', '')] = {'type': 'integer', 'cardinality': len(classes),
+                                                        'classes': classes}
+    return profile
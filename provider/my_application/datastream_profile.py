@@ -0,0 +1,239 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import os
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from datastream_cache import COMPRESSED_EXTENSIONS
+from datastream_generator import generator_profile, load_generator_spec
+
+"""
+Datastream profile module.
+Profiles a datastream file when it is uploaded: number of rows and, for every column, its type, its cardinality and
+its classes. The file is read one record batch at a time and every column is processed as a whole (vectorized), the
+values are never converted one by one.
+
+The profile is stored with the datastream. The compiled datastream of a .csv file stores its columns with their
+profiled types, the Spark evaluation uses them to type the targets, and the classes are known before the first record
+is released.
+
+A .csv column is typed as a number only if the conversion is lossless: every value is written the way the number is
+published. Values such as '007', '+5', '1.50' or '1e5' keep the column as strings.
+
+Profile:
+    {'row_count': <number of rows>,
+     'columns': {<column>: {'type': 'integer' | 'float' | 'boolean' | 'string',
+                            'cardinality': <number of distinct values, None if above MAX_CARDINALITY>,
+                            'classes': <distinct values, None if above MAX_CLASSES>}}}
+"""
+
+# Supported datastream file extensions and their data format, .gen files hold the specification of a generator
+DATA_FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.gen': 'generator'}
+
+# Distinct values are counted up to MAX_CARDINALITY, and listed as classes up to MAX_CLASSES
+MAX_CARDINALITY = 10000
+MAX_CLASSES = 100
+
+# Types inferred for the .csv columns, from the narrowest
+_TYPE_ORDER = ['integer', 'float', 'string']
+_ARROW_TYPES = {'integer': pa.int64(), 'float': pa.float64()}
+
+
+def datastream_format(file_path):
+    """
+    Data format of a datastream file, given by its extension. Only .csv files can be compressed.
+
+    :param file_path: Path to the datastream file
+    :return: 'csv', 'parquet', 'arrow', 'generator' or None if the format is not supported
+    """
+    root, extension = os.path.splitext(file_path.lower())
+    if extension in COMPRESSED_EXTENSIONS:
+        extension = os.path.splitext(root)[1]
+        if extension != '.csv':
+            return None
+    return DATA_FORMATS.get(extension)
+
+
+def profile_datastream(file_path, data_format=None):
+    """
+    Profile a datastream file.
+
+    :param file_path: Path to the datastream file
+    :param data_format: Format of the file: 'csv' (possibly compressed), 'parquet', 'arrow' or 'generator'. By default
+    it is given by the file extension
+    :return: Profile dictionary
+    """
+    if data_format is None:
+        data_format = datastream_format(file_path)
+    if data_format == 'generator':
+        return generator_profile(load_generator_spec(file_path))
+    if data_format == 'parquet':
+        parquet_file = pq.ParquetFile(file_path)
+        return _profile_batches(parquet_file.schema_arrow, parquet_file.iter_batches(), typed=True)
+    if data_format == 'arrow':
+        with pa.memory_map(file_path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+            return _profile_batches(reader.schema, batches, typed=True)
+    # Every .csv column is read as strings, the types are inferred over the whole file and not only on its first block.
+    # Rows that do not have as many values as the header are left out, as they are left out of the compiled datastream
+    parse_options = pa_csv.ParseOptions(quote_char='|', invalid_row_handler=lambda row: 'skip')
+    with pa.input_stream(file_path, compression='detect') as source:
+        header = pa_csv.open_csv(source, parse_options=parse_options)
+        names = header.schema.names
+    with pa.input_stream(file_path, compression='detect') as source:
+        reader = pa_csv.open_csv(source, parse_options=parse_options,
+                                 convert_options=pa_csv.ConvertOptions(
+                                     column_types={name: pa.string() for name in names}))
+        return _profile_batches(reader.schema, reader, typed=False)
+
+
+def _profile_batches(schema, batches, typed):
+    """
+    Profile a stream of record batches.
+
+    :param schema: Arrow schema of the batches
+    :param batches: Iterable of record batches
+    :param typed: The columns are typed (columnar files), otherwise their type is inferred from their string values
+    :return: Profile dictionary
+    """
+    names = [name for name in schema.names if not name.startswith('__index_level_')]
+    types = {name: (_arrow_type(schema.field(name).type) if typed else None) for name in names}
+    # Types that hold all the string values seen so far, from the narrowest
+    candidates = {name: _TYPE_ORDER for name in names}
+    distinct = {name: set() for name in names}
+    row_count = 0
+    for name in names:
+        # The values of nested columns (lists, structs...) are not classes
+        if typed and pa.types.is_nested(schema.field(name).type):
+            distinct[name] = None
+    for batch in batches:
+        row_count += batch.num_rows
+        for name in names:
+            column = batch.column(schema.get_field_index(name))
+            if typed:
+                # The classes are stored with the profile, as json
+                column = json_column(column)
+            else:
+                # Empty strings are missing values, they do not decide the type
+                column = pc.filter(column, pc.not_equal(column, ''))
+                if len(column) > 0:
+                    candidates[name] = _infer_types(column, candidates[name])
+                    types[name] = candidates[name][0]
+            if distinct[name] is not None:
+                distinct[name].update(pc.unique(column.drop_null()).to_pylist())
+                if len(distinct[name]) > MAX_CARDINALITY:
+                    distinct[name] = None
+
+    columns = {}
+    for name in names:
+        # A column without any value is left as strings
+        types[name] = types[name] or 'string'
+        values = distinct[name]
+        if values is not None and not typed:
+            values = {_convert(value, types[name]) for value in values}
+        elif values is not None:
+            values = {_json_value(value) for value in values}
+        columns[name.replace(' ', '')] = {
+            'type': types[name],
+            'cardinality': len(values) if values is not None else None,
+            'classes': sorted(values, key=str) if values is not None and len(values) <= MAX_CLASSES else None}
+    return {'row_count': row_count, 'columns': columns}
+
+
+def json_column(column):
+    """
+    Convert the columns whose values can not be serialized to json: decimals are converted to floats (as they are
+    profiled), binary values to strings.
+
+    :param column: Arrow array
+    :return: Arrow array
+    """
+    if pa.types.is_decimal(column.type):
+        return pc.cast(column, pa.float64())
+    if pa.types.is_binary(column.type) or pa.types.is_large_binary(column.type) or \
+            pa.types.is_fixed_size_binary(column.type):
+        try:
+            return pc.cast(column, pa.string())
+        except pa.ArrowInvalid:
+            # The values that are not UTF-8 are decoded with replacement characters
+            return pa.array([value.decode('utf-8', 'replace') if value is not None else None
+                             for value in column.to_pylist()], pa.string())
+    return column
+
+
+def _json_value(value):
+    """
+    Class value of a typed column, as a json scalar: dates and times are written in ISO format, as they are published,
+    durations in seconds.
+    """
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    return value
+
+
+def _arrow_type(arrow_type):
+    """Profile type of an Arrow column type."""
+    if pa.types.is_boolean(arrow_type):
+        return 'boolean'
+    if pa.types.is_integer(arrow_type):
+        return 'integer'
+    if pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+        return 'float'
+    return 'string'
+
+
+def _infer_types(column, candidates):
+    """
+    Types that hold all the string values of a column without loss, among the types that hold the values seen so far.
+    A column that was typed as integers can only be widened to floats if its previous values are floats as well.
+
+    :param column: Column of strings
+    :param candidates: Types that hold the values of the previous batches, from the narrowest
+    :return: Types that hold the values, from the narrowest, 'string' being the last one
+    """
+    return [candidate for candidate in candidates if candidate == 'string' or _casts_to(column, candidate)]
+
+
+def _casts_to(column, candidate):
+    """
+    Check that the string values of a column convert to a type without loss: the numbers are written back as they are
+    in the file. Integers are written without sign or leading zeros, floats are finite and written without trailing
+    zeros, or with a single one for whole numbers ('3.0').
+    """
+    try:
+        values = pc.cast(column, _ARROW_TYPES[candidate])
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return False
+    written = pc.cast(values, pa.string())
+    lossless = pc.equal(written, column)
+    if candidate == 'float':
+        lossless = pc.and_(pc.or_(lossless, pc.equal(pc.binary_join_element_wise(written, '.0', ''), column)),
+                           pc.is_finite(values))
+    return pc.all(lossless).as_py()
+
+
+def _convert(value, value_type):
+    """Convert a string value of a .csv column to the type of the column."""
+    if value_type == 'integer':
+        return int(value)
+    if value_type == 'float':
+        return float(value)
+    return value
+
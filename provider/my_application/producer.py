@@ -13,11 +13,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import datetime
 import time
 import pause
-from confluent_kafka import Producer
+from batch_producer import BatchProducer
+from confluent_kafka.admin import AdminClient, NewTopic
+from release_scheduler import ReleaseScheduler, TokenBucket
 import csv
+import itertools
+import collections
+import threading
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.mongodb import MongoDBJobStore
 from repositories.CompetitionRepository import CompetitionRepository, DatastreamRepository
@@ -27,19 +33,36 @@ import sparkEvaluator
 from bson import json_util
 import json
 import orjson
-from consumer import DataStreamerServicer
-from stream_server import StreamServer
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from consumer import DataStreamerServicer, AsyncDataStreamerServicer
+from stream_server import StreamServer, AsyncStreamServer, CompetitionRouter
+from stream_auth import StreamAuthenticator, SUBSCRIPTION_EVENTS_TOPIC
 import os
 from pyspark.sql import SparkSession
 from sparkToMongo import SparkToMongo
+from datastream_profile import datastream_format, json_column, DATA_FORMATS
+from datastream_generator import generate_rows, load_generator_spec
+from datastream_cache import cache_path, load_row_index, open_datastream_file, read_csv_rows
 from repository import MongoRepository
 from multiprocessing import Process
+from multiprocessing.connection import wait
 from pyspark.sql.types import *
 import logging
 logging.basicConfig(level='DEBUG')
 
 spark_master = "spark://" + os.environ['SPARK_HOST'] + ":7077"
 _ONE_DAY_IN_SECONDS = 60 * 60 * 24
+# Minimum time (in seconds) between two saves of the release cursor of a stream
+_CURSOR_SAVE_INTERVAL = 5
+# Sources of the rows of a .csv datastream: its compiled datastream, or the file itself
+_COMPILED_SOURCE = 'compiled'
+_FILE_SOURCE = 'file'
+# Time (in seconds) to wait before restarting a producer process that died
+_PRODUCER_RESTART_DELAY = 5
+# Minimum number of rows in the record batches read from a Parquet file
+_MIN_READ_BATCH_SIZE = 1024
 
 """
 Read the environment variables or the config file to define the services:
@@ -86,9 +109,27 @@ _STREAM_REPO = config['STREAM_DATA_FILE']
 _COMPETITION_REPO = CompetitionRepository(_SQL_HOST, _SQL_DBNAME)
 _DATASTREAM_REPO = DatastreamRepository(_SQL_HOST, _SQL_DBNAME)
 _COMPETITION_GENERATED_CODE = config['COMPETITION_GENERATED_CODE']
-
-
-def _create_competition(competition, competition_config):
+# Kafka producer settings for publishing the stream: linger, batch size, compression...
+_KAFKA_PRODUCER_CONFIG = config.get('KAFKA_PRODUCER', {})
+# Kafka topic settings: partitions, replication, topic config (compression, retention...) by default and per topic
+_KAFKA_TOPICS_CONFIG = config.get('KAFKA_TOPICS', {})
+# Serve the participants with the asyncio gRPC server (grpc.aio) instead of a thread pool
+_GRPC_ASYNC = config.get('GRPC_ASYNC', False)
+# Number of gRPC server processes sharing the port, one per core by default
+_GRPC_WORKERS = config.get('GRPC_WORKERS', os.cpu_count() or 1)
+if not isinstance(_GRPC_WORKERS, int) or isinstance(_GRPC_WORKERS, bool) or _GRPC_WORKERS < 1:
+    raise ValueError("GRPC_WORKERS must be a number of gRPC server processes, at least 1")
+# Time to live (in seconds) and maximum number of the cached credential lookups of the gRPC workers
+_AUTH_CACHE_TTL = config.get('AUTH_CACHE_TTL', 60)
+_AUTH_CACHE_SIZE = config.get('AUTH_CACHE_SIZE', 10000)
+
+# Topics of a competition, by the suffix added to the competition name
+_COMPETITION_TOPICS = {'stream': '', 'spark_train': 'spark_train', 'predictions': 'predictions',
+                       'spark_predictions': 'spark_predictions', 'spark_golden': 'spark_golden',
+                       'spark_measures': 'spark_measures'}
+
+
+def _create_competition(competition, competition_config, resume=False):
     """
     Starts the processes needed to run the competition.
     Reads the .csv file, initiates Kafka to start generating the stream.
@@ -96,19 +137,17 @@ def _create_competition(competition, competition_config):
 
     :param competition: The competition object
     :param competition_config: Competition configuration dictionary
+    :param resume: The competition was already running, the stream is resumed from its release cursor
     :return: None
     """
-    items, predictions, initial_batch = read_csv_file(competition, competition_config)
+    _provision_topics(competition)
     processes = []
-    producer_process = Process(target=_start_competition, args=(competition, items, predictions, initial_batch))
+    producer_process = Process(target=_start_competition, args=(competition, competition_config, resume))
     producer_process.start()
     processes.append(producer_process)
-    try:
-        consumer_process = Process(target=_create_consumer, args=(competition, competition_config))
-        consumer_process.start()
-    except Exception as e:
-        print(e)
-        logging.debug("Consumer process exception: {}".format(e))
+    supervisor = threading.Thread(target=_supervise_producer, args=(competition, competition_config, producer_process))
+    supervisor.daemon = True
+    supervisor.start()
     baseline_process = Process(target=_create_baseline, args=(competition, competition_config))
     baseline_process.start()
     processes.append(baseline_process)
@@ -122,19 +161,126 @@ def _create_competition(competition, competition_config):
     p6.start()
 
 
-def read_csv_file(competition, competition_config, data_format='csv'):
+def _supervise_producer(competition, competition_config, producer_process):
+    """
+    Restarts the producer process, from its release cursor, if it dies before the end of the competition.
+    The producer processes that are still running at the end of the competition are terminated.
+
+    :param competition: Competition object
+    :param competition_config: Competition configuration dictionary
+    :param producer_process: Producer process
+    :return: None
+    """
+    end = competition.end_date + datetime.timedelta(seconds=60)
+    while True:
+        producer_process.join(max(0.0, (end - datetime.datetime.now()).total_seconds()))
+        if producer_process.is_alive():
+            producer_process.terminate()
+            return
+        if producer_process.exitcode == 0 or datetime.datetime.now() >= competition.end_date:
+            return
+        logging.debug("Producer of competition {} exited with code {}, resuming the stream".format(
+            competition.competition_id, producer_process.exitcode))
+        time.sleep(_PRODUCER_RESTART_DELAY)
+        producer_process = Process(target=_start_competition, args=(competition, competition_config, True))
+        producer_process.start()
+
+
+def _supervise_stream_servers(workers):
+    """
+    Starts the gRPC server workers, and restarts the workers that exit.
+
+    Each worker is a process with its own gRPC server on the shared port, and its own consumers of the competition
+    streams: the participants connected to a worker are served by this worker only, whichever worker they are
+    connected to they receive the whole stream. The consumer groups of a worker are named after its slot, a restarted
+    worker takes over the consumer groups of the worker it replaces.
+
+    :param workers: Number of workers
+    :return: None
+    """
+    processes = []
+    for slot in range(workers):
+        process = Process(target=_create_consumer, args=(slot,))
+        process.start()
+        processes.append(process)
+    while True:
+        wait([process.sentinel for process in processes])
+        for i, process in enumerate(processes):
+            if process.is_alive():
+                continue
+            logging.debug("gRPC server worker exited with code {}, restarting it".format(process.exitcode))
+            time.sleep(_PRODUCER_RESTART_DELAY)
+            processes[i] = Process(target=_create_consumer, args=(i,))
+            processes[i].start()
+
+
+def _provision_topics(competition):
+    """
+    Creates the Kafka topics of the competition with the configured number of partitions, replication factor and
+    topic config (compression, retention...), instead of relying on the broker defaults. Topics that already exist are
+    left as they are.
+
+    :param competition: Competition object
+    :return: None
+    """
+    _create_topics([(competition.name.lower().replace(" ", "") + suffix, name)
+                    for name, suffix in _COMPETITION_TOPICS.items()])
+
+
+def _provision_subscription_events_topic():
+    """
+    Creates the topic of the subscription events, read by all the gRPC server workers, with the configured settings
+    like the topics of the competitions. It is left as it is if it already exists.
+
+    :return: None
+    """
+    _create_topics([(SUBSCRIPTION_EVENTS_TOPIC, 'subscription_events')])
+
+
+def _create_topics(topics):
+    """
+    Creates Kafka topics with the settings of KAFKA_TOPICS: the "default" entry, overridden by the entry of the topic.
+
+    :param topics: List of (topic, name of the entry of its settings in KAFKA_TOPICS)
+    :return: None
+    """
+    admin = AdminClient({'bootstrap.servers': SERVER_HOST})
+    default = _KAFKA_TOPICS_CONFIG.get('default', {})
+    new_topics = []
+    for topic, name in topics:
+        settings = dict(default)
+        settings.update(_KAFKA_TOPICS_CONFIG.get(name, {}))
+        topic_config = dict(default.get('config', {}))
+        topic_config.update(_KAFKA_TOPICS_CONFIG.get(name, {}).get('config', {}))
+        new_topics.append(NewTopic(topic,
+                                   num_partitions=settings.get('num_partitions', 1),
+                                   replication_factor=settings.get('replication_factor', 1),
+                                   config=topic_config))
+    for topic, future in admin.create_topics(new_topics).items():
+        try:
+            future.result()
+        except Exception as e:
+            logging.debug("Topic {} not created: {}".format(topic, e))
+
+
+def read_csv_file(competition, competition_config, data_format=None, cursor=None):
     """
-    Reads the data from a .csv file for a given competition.
+    Reads the data from a .csv, Parquet or Arrow IPC file for a given competition, or samples it from a generator.
+
+    Only the initial batch is read right away. The rest of the file is read lazily, one batch at a time, so the memory
+    used by the producer is bounded by the batch size and not by the size of the datastream.
 
     :param competition: Competition object
     :param competition_config: Cometition configuration
-    :param data_format: Format of the data. For now, the only format supported is 'csv'
-    :return: It returns the read data in batches(without the target value), the target values and the initial batch(with target values)
+    :param data_format: Format of the data: 'csv', 'parquet', 'arrow' or 'generator'. By default it is given by the file
+    extension, .csv files can be compressed (.csv.gz, .csv.bz2, .csv.zst)
+    :param cursor: Release cursor of the stream, the source the datastream is read from is saved with it. If the
+    stream is resumed, the initial batch is not read again and the datastream is read from the first row that has not
+    been released, from the source it has been released from
+    :return: It returns the initial batch(with target values) and a generator of batches, each one being a tuple with
+    the data (without the target value), the target values and the position in the datastream after the batch
     """
     initial_batch = []
-    items = []
-    predictions = []
-    classes = {}
     initial_batch_size = competition.initial_batch_size
 
     datastream = _DATASTREAM_REPO.get_datastream_by_id(competition.datastream_id)
@@ -142,63 +288,289 @@ def read_csv_file(competition, competition_config, data_format='csv'):
     # Creating file path: ../local/data/uploads/stream_data_file
     file_path = os.path.join(_UPLOAD_REPO, _STREAM_REPO, file_path)
 
-    # _UPLOAD_REPO+ file_path
-    # Read csv file
-    count_classes = False
+    # Targets for which the classes should be registered
+    targets = set()
+    class_targets = set()
     for key in competition_config.keys():
+        target = str(key).lower().replace(' ', '')
+        targets.add(target)
         for value in competition_config[key]:
             if value in ["kappa", "f1", "precision", "recall"]:
-                count_classes = True
-                classes[key] = []
+                class_targets.add(target)
+
+    if data_format is None:
+        data_format = datastream_format(file_path)
+    if data_format not in DATA_FORMATS.values():
+        logging.debug("Unsupported data format for file {}".format(file_path))
+        return initial_batch, iter(())
+
+    resumed = cursor is not None and cursor.resumed
+    source = _datastream_source(datastream, data_format, cursor.source if resumed else None)
+    if source is None:
+        # The positions saved with the cursor are positions in a source that can not be read any more
+        logging.debug("Stream of competition {} not resumed: it was released from the {} datastream, which is not "
+                      "available".format(competition.competition_id, cursor.source))
+        return initial_batch, iter(())
+    if cursor is not None:
+        cursor.source = source
 
-    if data_format == 'csv':
-        try:
-            with open(file_path, 'r') as csvfile:
-                datareader = csv.reader(csvfile, delimiter=',', quotechar='|')
-                data = list(datareader)
-                nb_rows = len(data)
-                header = data[0]
-                row_id = 1
-                # Process initial batch
-                for row in range(1, initial_batch_size + 1):
-                    if not all(item == "" for item in data[row]):
-                        values = {'tag': 'INIT', 'rowID': row_id}
-                        row_id = row_id + 1
-                        for i in range(0, len(data[row])):
-                            field = header[i].replace(" ", "")
-                            values[field] = data[row][i]
-                        initial_batch.append(values)
-                # After the initial batch
-                for row in range(initial_batch_size + 1, nb_rows - 1):
-                    if not all(item == "" for item in data[row]):
-                        try:
-                            values = {'rowID': row_id}
-                            prediction = {'rowID': row_id}
-                            row_id = row_id + 1
-                            for i in range(0, len(data[row])):
-                                for key in competition_config.keys():
-                                    x = header[i].lower().replace(' ', '')  # Field name
-                                    y = str(key.lower().replace(' ', ''))  # Key
-                                    # If field name == target = > prediction
-                                    field = header[i].replace(" ", "")
-                                    if x == y:
-                                        prediction[field] = data[row][i]
-                                        if count_classes:
-                                            if str(data[row][i]) not in classes[field]:
-                                                classes[field].append(str(data[row][i]))
-                                    # If field name != target = > values
-                                    else:
-                                        values[field] = data[row][i]
-                            # add values to items list and prediction to predictions list
-                            items.append(values)
-                            predictions.append(prediction)
-                        except Exception as e:
-                            print('error')
-
-        except IOError as e:
-            print("could not open file" + file_path)
-
-    return items, predictions, initial_batch
+    # _UPLOAD_REPO+ file_path
+    # Read the file
+    start = cursor.row_index if resumed else 0
+    rows = _read_rows(datastream, file_path, data_format, start, competition.batch_size, source)
+    try:
+        header = next(rows)
+    except (IOError, ValueError, StopIteration):
+        logging.debug("Could not open file {}".format(file_path))
+        return initial_batch, iter(())
+
+    # Resolve once which columns are targets (=> prediction) and which are features (=> values)
+    fields = [column.replace(" ", "") for column in header]
+    columns = [column.lower().replace(' ', '') for column in header]
+    target_indices = [i for i, column in enumerate(columns) if column in targets]
+    feature_indices = [i for i, column in enumerate(columns) if column not in targets]
+    classes = {fields[i]: set() for i in target_indices if columns[i] in class_targets}
+
+    # Reuse the profile computed when the datastream was uploaded: types of the columns and classes of the targets
+    profile = datastream.get_profile()
+    tracked_classes = {}
+    for field, target_classes in classes.items():
+        profiled_classes = profile['columns'].get(field, {}).get('classes') if profile is not None else None
+        if profiled_classes is not None:
+            target_classes.update(profiled_classes)
+        else:
+            tracked_classes[field] = target_classes
+
+    if resumed:
+        # The initial batch has already been released
+        batches = _read_batches(rows, fields, feature_indices, target_indices, competition.batch_size,
+                                cursor.row_id, tracked_classes, start)
+        return initial_batch, batches
+
+    row_id = 1
+    # Process initial batch
+    for row in itertools.islice(rows, initial_batch_size):
+        if not all(item == "" for item in row):
+            values = {'tag': 'INIT', 'rowID': row_id}
+            row_id = row_id + 1
+            values.update(zip(fields, row))
+            initial_batch.append(values)
+
+    batches = _read_batches(rows, fields, feature_indices, target_indices, competition.batch_size, row_id,
+                            tracked_classes, initial_batch_size)
+    return initial_batch, batches
+
+
+def _read_rows(datastream, file_path, data_format, start=0, batch_size=1, source=None):
+    """
+    Generator over the rows of a datastream. A .csv datastream is read from its compiled datastream, the file itself
+    is parsed if the datastream has not been compiled: its compilation is still running, or it failed, or the
+    datastream was uploaded before the compiled datastreams. The rows of a generator are sampled one batch at a time.
+
+    :param datastream: Datastream object
+    :param file_path: Path to the datastream file
+    :param data_format: Format of the data
+    :param start: Index of the first row to read, 0 being the first row after the header. The compiled datastreams,
+    the indexed .csv files and the columnar files are read from that row directly, other .csv files are parsed up to
+    that row
+    :param batch_size: Number of rows in a batch of the stream: number of rows sampled at once from a generator, size
+    of the record batches read from a Parquet file
+    :param source: Source of the rows of a .csv datastream, see _datastream_source. By default the compiled datastream
+    if it has been compiled, the file otherwise
+    :return: Header first, then every row of the datastream from start on, as a sequence of values
+    """
+    if data_format == 'csv' and source is None:
+        source = _datastream_source(datastream, data_format)
+    if data_format == 'generator':
+        for row in generate_rows(load_generator_spec(file_path), start, batch_size):
+            yield row
+    elif data_format == 'parquet':
+        for row in _read_parquet_rows(file_path, start, batch_size):
+            yield row
+    elif data_format == 'arrow':
+        for row in _read_arrow_rows(file_path, start):
+            yield row
+    elif source == _COMPILED_SOURCE:
+        for row in _read_arrow_rows(cache_path(datastream.content_hash), start):
+            yield row
+    else:
+        rows = _read_csv_rows(file_path)
+        yield next(rows)
+        row_index = load_row_index(datastream.content_hash) if datastream.content_hash is not None else None
+        if row_index is not None:
+            rows.close()
+            rows = read_csv_rows(file_path, row_index, start)
+        else:
+            rows = itertools.islice(rows, start, None)
+        for row in rows:
+            yield row
+
+
+def _datastream_source(datastream, data_format, saved_source=None):
+    """
+    Source the rows of a datastream are read from: _COMPILED_SOURCE for a .csv datastream read from its compiled
+    datastream, _FILE_SOURCE for a .csv file parsed as it is, the data format for the other formats. The datastream is
+    compiled in the background when it is uploaded, it is never compiled by the producer.
+
+    The positions of the rows are not the same in the compiled datastream and in the .csv file: the empty rows and the
+    rows that do not have as many values as the header are left out of the compiled datastream. The source is saved
+    with the release cursor, a resumed stream is read from the source it has been released from.
+
+    :param datastream: Datastream object
+    :param data_format: Format of the data
+    :param saved_source: Source saved with the release cursor of a resumed stream, None for a new stream
+    :return: Source, None if the saved source is not available any more
+    """
+    if data_format != 'csv':
+        return data_format
+    compiled = datastream.content_hash is not None and os.path.exists(cache_path(datastream.content_hash))
+    if saved_source is None:
+        return _COMPILED_SOURCE if compiled else _FILE_SOURCE
+    if saved_source == _COMPILED_SOURCE and not compiled:
+        return None
+    return saved_source
+
+
+def _read_csv_rows(file_path):
+    """
+    Generator over the rows of a .csv file. The file stays open only while the rows are being consumed, compressed
+    files are decompressed incrementally.
+
+    :param file_path: Path to the .csv file, or to the compressed .csv file
+    :return: Header first, then every row of the file as a list of strings
+    """
+    with open_datastream_file(file_path) as csvfile:
+        datareader = csv.reader(csvfile, delimiter=',', quotechar='|')
+        for row in datareader:
+            yield row
+
+
+def _read_parquet_rows(file_path, start=0, batch_size=1):
+    """
+    Generator over the rows of a Parquet file. The file is read one record batch at a time and only the projected
+    columns are decoded, the memory used is bounded by the size of the record batches and not by the size of the row
+    groups. The values keep the types of the Parquet columns.
+
+    :param file_path: Path to the Parquet file
+    :param start: Index of the first row to read, the row groups before it are not read
+    :param batch_size: Number of rows in a batch of the stream, the record batches hold at least _MIN_READ_BATCH_SIZE
+    rows
+    :return: Header first, then every row of the file from start on, as a tuple
+    """
+    parquet_file = pq.ParquetFile(file_path)
+    columns = _projected_columns(parquet_file.schema_arrow.names)
+    yield columns
+    row_groups = []
+    for i in range(parquet_file.num_row_groups):
+        num_rows = parquet_file.metadata.row_group(i).num_rows
+        if not row_groups and start >= num_rows:
+            start -= num_rows
+            continue
+        row_groups.append(i)
+    if not row_groups:
+        return
+    for record_batch in parquet_file.iter_batches(batch_size=max(batch_size, _MIN_READ_BATCH_SIZE),
+                                                  row_groups=row_groups, columns=columns):
+        if start >= record_batch.num_rows:
+            start -= record_batch.num_rows
+            continue
+        record_batch = record_batch.slice(start)
+        start = 0
+        for row in _record_batch_rows(record_batch, range(record_batch.num_columns)):
+            yield row
+
+
+def _read_arrow_rows(file_path, start=0):
+    """
+    Generator over the rows of an Arrow IPC (Feather V2) file. The file is memory-mapped and read one record batch at
+    a time, only the projected columns are converted. The values keep the types of the Arrow columns.
+
+    :param file_path: Path to the Arrow IPC file
+    :param start: Index of the first row to read, the record batches before it are not converted
+    :return: Header first, then every row of the file from start on, as a tuple
+    """
+    with pa.memory_map(file_path, 'r') as source:
+        reader = pa.ipc.open_file(source)
+        names = reader.schema.names
+        columns = _projected_columns(names)
+        indices = [names.index(column) for column in columns]
+        yield columns
+        for i in range(reader.num_record_batches):
+            record_batch = reader.get_batch(i)
+            if start >= record_batch.num_rows:
+                start -= record_batch.num_rows
+                continue
+            record_batch = record_batch.slice(start)
+            start = 0
+            for row in _record_batch_rows(record_batch, indices):
+                yield row
+
+
+def _record_batch_rows(record_batch, indices):
+    """
+    Rows of a record batch. Every column is converted to Python values as a whole.
+
+    :param record_batch: Record batch
+    :param indices: Indices of the columns to read
+    :return: Iterator over the rows, as tuples
+    """
+    return zip(*[json_column(record_batch.column(index)).to_pylist() for index in indices])
+
+
+def _projected_columns(names):
+    """
+    Columns of a columnar file that are part of the datastream. The index columns written by pandas are left out.
+
+    :param names: Column names in the file schema
+    :return: List of column names to read
+    """
+    return [name for name in names if not name.startswith('__index_level_')]
+
+
+def _read_batches(rows, fields, feature_indices, target_indices, batch_size, row_id, classes, position=0):
+    """
+    Splits the rows that come after the initial batch into values and target values and groups them in batches.
+
+    :param rows: Iterator over the remaining rows of the datastream
+    :param fields: Column names
+    :param feature_indices: Indices of the feature columns
+    :param target_indices: Indices of the target columns
+    :param batch_size: Number of rows in one batch
+    :param row_id: ID of the first row to be read
+    :param classes: Set of the classes seen so far, for each target evaluated with classification measures whose
+    classes are not known from the profile of the datastream
+    :param position: Index in the datastream of the first row to be read
+    :return: Generator of (items, predictions, position) tuples, each of at most batch_size rows. The position is the
+    index in the datastream of the row that follows the batch
+    """
+    nb_columns = len(fields)
+    feature_fields = [fields[i] for i in feature_indices]
+    target_fields = [fields[i] for i in target_indices]
+    class_indices = [(i, classes[fields[i]]) for i in target_indices if fields[i] in classes]
+    items = []
+    predictions = []
+    for row in rows:
+        position += 1
+        if not all(item == "" for item in row):
+            if len(row) != nb_columns:
+                logging.debug("Row {} left out: {} values for {} columns".format(position - 1, len(row), nb_columns))
+                continue
+            values = {'rowID': row_id}
+            prediction = {'rowID': row_id}
+            row_id = row_id + 1
+            values.update(zip(feature_fields, [row[i] for i in feature_indices]))
+            prediction.update(zip(target_fields, [row[i] for i in target_indices]))
+            for i, target_classes in class_indices:
+                target_classes.add(row[i])
+            # add values to items list and prediction to predictions list
+            items.append(values)
+            predictions.append(prediction)
+        if len(items) == batch_size:
+            yield items, predictions, position
+            items = []
+            predictions = []
+    if items:
+        yield items, predictions, position
 
 
 def _create_evaluation_spark(kafka_server, competition, competition_config):
@@ -247,6 +619,13 @@ def _create_evaluation_spark(kafka_server, competition, competition_config):
         y = str(key).replace(' ', '')  # Key
         targets.append(y)
 
+    # Numeric targets are published as numbers, the profile of the datastream gives their type
+    profile = _datastream_profile(competition)
+    numeric_targets = set()
+    if profile is not None:
+        numeric_targets = {target for target in targets
+                           if profile['columns'].get(target, {}).get('type') in ('integer', 'float')}
+
     # Fields for published message
     train_schema = StructType() \
         .add("Deadline", StringType(), False) \
@@ -266,7 +645,7 @@ def _create_evaluation_spark(kafka_server, competition, competition_config):
             if measure in regression_measures:
                 regression = True
                 if target not in train_schema.fieldNames():
-                    train_schema.add(target, StringType(), False)
+                    train_schema.add(target, DoubleType() if target in numeric_targets else StringType(), False)
                 if target not in prediction_schema.fieldNames():
                     prediction_schema.add("prediction_" + target, FloatType(), False)
             elif measure in classification_measures:
@@ -318,6 +697,19 @@ def _create_evaluation_spark(kafka_server, competition, competition_config):
     spark_context.stop()
 
 
+def _datastream_profile(competition):
+    """
+    Profile of the datastream of a competition.
+
+    :param competition: Competition object
+    :return: Profile dictionary, None if the datastream has not been profiled
+    """
+    datastream = _DATASTREAM_REPO.get_datastream_by_id(competition.datastream_id)
+    if datastream is None:
+        return None
+    return datastream.get_profile()
+
+
 def _create_spark2mongo_sink(kafka_server, competition, competition_config):
     """
     Creates Mongo sink for Spark job to write to it.
@@ -334,25 +726,78 @@ def _create_spark2mongo_sink(kafka_server, competition, competition_config):
     spark_to_mongo.run()
 
 
-def _start_competition(competition, items, predictions, initial_batch):
-    '''Starts Kafka producer to publish the stream.'''
+def _start_competition(competition, competition_config, resume=False):
+    '''Reads the datastream and starts Kafka producer to publish the stream, from the saved release cursor if resumed.'''
+    repository = MongoRepository(_MONGO_HOST)
+    if resume:
+        cursor = ReleaseCursor.load(competition.competition_id, repository)
+    else:
+        cursor = ReleaseCursor(competition.competition_id, repository)
+    if cursor.finished:
+        return
+    initial_batch, batches = read_csv_file(competition, competition_config, cursor=cursor)
+    if not cursor.resumed:
+        # Without any batch released, the stream is resumed after the initial batch
+        cursor.row_index = competition.initial_batch_size
+        cursor.row_id = len(initial_batch) + 1
     producer = CompetitionProducer(SERVER_HOST)
-    producer.create_competition(competition, items, predictions, initial_batch)
+    producer.create_competition(competition, initial_batch, batches, cursor)
+
 
+def _create_consumer(worker=0):
+    '''
+    Starts a gRPC server of all the competitions: streams sent to users and predictions sent by users.
 
-def _create_consumer(competition, competition_config):
-    ''' Starts the consumer for streams of predictions sent by users.'''
+    :param worker: Slot of the worker, it names the Kafka consumer groups of the worker
+    '''
+    # The workers share the port, the kernel balances the connections between them. Every worker serves all the
+    # competitions, the calls are routed to their competition
     options = (('grpc.so_reuseport', 1),)
+    # The credentials are looked up once for all the competitions of the worker
+    authenticator = StreamAuthenticator(_SQL_HOST, _SQL_DBNAME, _AUTH_CACHE_TTL, _AUTH_CACHE_SIZE)
+    authenticator.watch_subscription_events(SERVER_HOST, worker=worker)
+    if _GRPC_ASYNC:
+        try:
+            asyncio.run(_serve_consumer_async(options, authenticator, worker))
+        except Exception as e:
+            logging.debug("Inside consumer process: {}".format(e))
+        return
     grpc_server = StreamServer('0.0.0.0:50051', options=options)
     try:
-        streamer = DataStreamerServicer(SERVER_HOST, competition, competition_config)
-        grpc_server.add_server(streamer, competition)
+        grpc_server.add_router(CompetitionRouter(
+            lambda competition_code: _load_streamer(competition_code, authenticator, worker=worker)))
         grpc_server.start_server()
         grpc_server._wait_forever()
     except Exception as e:
         logging.debug("Inside consumer process: {}".format(e))
 
 
+async def _serve_consumer_async(options, authenticator, worker=0):
+    """Serve the participants of all the competitions on the event loop of the asyncio gRPC server."""
+    grpc_server = AsyncStreamServer('0.0.0.0:50051', options=options)
+    grpc_server.add_router(CompetitionRouter(
+        lambda competition_code: _load_streamer(competition_code, authenticator, AsyncDataStreamerServicer, worker),
+        asynchronous=True))
+    await grpc_server.serve()
+
+
+def _load_streamer(competition_code, authenticator, servicer_class=DataStreamerServicer, worker=0):
+    """
+    Creates the servicer of a competition, when the gRPC server receives its first call.
+
+    :param competition_code: Competition code, sent by the users as competition_id
+    :param authenticator: StreamAuthenticator of the worker
+    :param servicer_class: DataStreamerServicer or AsyncDataStreamerServicer
+    :param worker: Slot of the gRPC server worker
+    :return: Servicer, None if there is no competition with this code
+    """
+    competition = authenticator.competition(competition_code)
+    if competition is None:
+        return None
+    measures = MongoRepository(_MONGO_HOST).get_competition_evaluation_measures(competition.competition_id)
+    return servicer_class(SERVER_HOST, competition, measures['measures'], authenticator, worker)
+
+
 def _create_mongo_sink_consumer(topic, competition):
     '''Starts writing the data published in Kafka to MongoDB.'''
     mongo_writer = ConsumerToMongo(SERVER_HOST, topic, competition)
@@ -362,7 +807,7 @@ def _create_mongo_sink_consumer(topic, competition):
 def _create_baseline(competition, competition_config):
     '''Starts the Baseline prediction model.'''
     topic = competition.name.lower().replace(" ", "")
-    baseline = BaselineToMongo(SERVER_HOST, topic, competition, competition_config)
+    baseline = BaselineToMongo(SERVER_HOST, topic, competition, competition_config, _datastream_profile(competition))
     baseline.write()
 
 
@@ -383,24 +828,149 @@ def terminate(processes):
         process.terminate()
 
 
+class ReleaseCursor:
+    """
+    Release cursor of a competition stream: last batch fully released, position of the next row in the datastream,
+    source of the rows the position refers to, next rowID and last delivered Kafka offsets.
+
+    The cursor only moves forward once the train group of a batch has been delivered. If a message of the train group
+    fails, the cursor stops at the last batch fully delivered: the stream goes on, but a restarted producer releases
+    again the batches from that position. The cursor is saved in MongoDB at most every _CURSOR_SAVE_INTERVAL seconds
+    and when the stream ends, so a restarted producer resumes after the last batch saved, at the cost of releasing
+    again the batches released since the last save.
+
+    The release lag of the delivered batches is saved with the cursor (release_lag: number of batches, mean, max and
+    last lag in seconds, and index of the last batch), so it can be queried from MongoDB while the competition runs
+    and after it ends. It is carried over when the stream is resumed.
+    """
+
+    def __init__(self, competition_id, repository=None, saved=None, clock=time.monotonic):
+        """
+        :param competition_id: Competition ID
+        :param repository: MongoRepository the cursor is saved to, the cursor is not saved if None
+        :param saved: Cursor fields loaded from MongoDB, if the stream is resumed
+        :param clock: Monotonic clock, in seconds
+        """
+        self.competition_id = competition_id
+        self.repository = repository
+        self.clock = clock
+        self.resumed = saved is not None
+        saved = saved or {}
+        self.batch_index = saved.get('batch_index', -1)
+        self.row_index = saved.get('row_index', 0)
+        self.row_id = saved.get('row_id', 1)
+        self.offsets = {(offset['topic'], offset['partition']): offset['offset'] for offset in saved.get('offsets', [])}
+        self.finished = saved.get('finished', False)
+        # Source the datastream is read from, the positions are positions in this source
+        self.source = saved.get('source')
+        release_lag = saved.get('release_lag', {})
+        self.lag_count = release_lag.get('batches', 0)
+        self.total_lag = release_lag.get('mean', 0.0) * self.lag_count
+        self.max_lag = release_lag.get('max', 0.0)
+        self.last_lag = release_lag.get('last', 0.0)
+        # Batches released but not delivered yet:
+        # (delivery report of the train group, batch index, position, rowID, release lag)
+        self.releases = collections.deque()
+        # Index of the first batch whose train group failed, the cursor does not move after it
+        self.failed_batch = None
+        self.saved_at = clock()
+
+    @classmethod
+    def load(cls, competition_id, repository):
+        """
+        Load the cursor saved for a competition.
+
+        :return: ReleaseCursor, resumed if a cursor has been saved
+        """
+        saved = None
+        try:
+            saved = repository.get_release_cursor(competition_id)
+        except Exception as e:
+            logging.debug("Release cursor of competition {} not loaded: {}".format(competition_id, e))
+        return cls(competition_id, repository, saved)
+
+    def release(self, report, batch_index, row_index, row_id, lag=None):
+        """
+        Register the release of the train group of a batch.
+
+        :param report: Delivery report of the train group
+        :param batch_index: Index of the batch
+        :param row_index: Position in the datastream of the row that follows the batch
+        :param row_id: rowID of the row that follows the batch
+        :param lag: Release lag of the batch in seconds, None if it is not measured
+        """
+        self.releases.append((report, batch_index, row_index, row_id, lag))
+
+    def track(self, reports):
+        """
+        Move the cursor after the batches whose train group has been delivered and record the delivered offsets, then
+        save the cursor if it has not been saved for _CURSOR_SAVE_INTERVAL seconds. The cursor does not move after a
+        batch whose train group has failed.
+
+        :param reports: Delivery reports of the batches in flight
+        """
+        for report in reports:
+            for partition, offset in report.offsets.items():
+                key = (report.topic, partition)
+                self.offsets[key] = max(self.offsets.get(key, -1), offset)
+        while self.releases and self.releases[0][0].done():
+            report, batch_index, row_index, row_id, lag = self.releases.popleft()
+            if report.failed and self.failed_batch is None:
+                self.failed_batch = batch_index
+                logging.debug("Train group of batch {} not delivered, the stream will be resumed after batch {}".format(
+                    batch_index, self.batch_index))
+            if self.failed_batch is not None:
+                continue
+            self.batch_index, self.row_index, self.row_id = batch_index, row_index, row_id
+            if lag is not None:
+                self.lag_count += 1
+                self.total_lag += lag
+                self.max_lag = max(self.max_lag, lag)
+                self.last_lag = lag
+        if self.clock() - self.saved_at >= _CURSOR_SAVE_INTERVAL:
+            self.save()
+
+    def finish(self):
+        """Save the cursor at the end of the stream. The stream is not finished if a train group has failed."""
+        self.finished = self.failed_batch is None
+        self.save()
+
+    def save(self):
+        self.saved_at = self.clock()
+        if self.repository is None:
+            return
+        cursor = {'batch_index': self.batch_index, 'row_index': self.row_index, 'row_id': self.row_id,
+                  'source': self.source,
+                  'offsets': [{'topic': topic, 'partition': partition, 'offset': offset}
+                              for (topic, partition), offset in self.offsets.items()],
+                  'finished': self.finished, 'saved_at': datetime.datetime.now(),
+                  'release_lag': {'batches': self.lag_count,
+                                  'mean': self.total_lag / self.lag_count if self.lag_count else 0.0,
+                                  'max': self.max_lag, 'last': self.last_lag, 'last_batch': self.batch_index}}
+        try:
+            self.repository.save_release_cursor(self.competition_id, cursor)
+        except Exception as e:
+            logging.debug("Release cursor of competition {} not saved: {}".format(self.competition_id, e))
+
+
 class CompetitionProducer:
     """
+    Kafka producer that recreates the stream of a competition.
 
+    Test and train groups are published as whole batches, the delivery of every batch is reported.
     """
     daemon = True
     producer = None
 
     def __init__(self, server):
-        conf = {'bootstrap.servers': server}
-        self.producer = Producer(conf)  # Create producer
+        self.producer = BatchProducer(server, _KAFKA_PRODUCER_CONFIG)  # Create producer
 
-    # message must be in byte format
-    def send(self, topic, message):
-        self.producer.produce(topic, message)  # Sending messages to a certain topic
-        self.producer.poll(timeout=0)
+    def send_batch(self, topic, messages, keys=None):
+        """Publish a batch of messages (in byte format) to a certain topic."""
+        return self.producer.send_batch(topic, messages, keys)
 
-    def main(self, topic, initial_batch, items, predictions, initial_training_time, batch_size, time_interval,
-             predictions_time_interval, spark_topic, competition_id):
+    def main(self, topic, initial_batch, batches, initial_training_time, time_interval, predictions_time_interval,
+             spark_topic, competition_id, cursor=None, start_date=None):
 
         """
         Recreates the stream. Sends the data in batches: first test (without the target value) and then train batches.
@@ -408,102 +978,312 @@ class CompetitionProducer:
 
         :param topic:
         :param initial_batch:
-        :param items:
-        :param predictions:
+        :param batches: Iterable of (test group, train group, position) tuples, read lazily from the datastream
         :param initial_training_time:
-        :param batch_size:
         :param time_interval:
         :param predictions_time_interval:
         :param spark_topic:
         :param competition_id:
+        :param cursor: Release cursor, updated every time a train group has been delivered
+        :param start_date: Start date of the competition. A resumed stream releases its batches at the instants they
+        had from the start date, the batches that are late are released at once until the stream has caught up
         :return:
         """
 
-        for item in initial_batch:
-            try:
-                # Send row by row from initial batch as json
-                self.send(topic, orjson.dumps(item))
-            except Exception as e:
-                # Check if topic exists, if not, create it and then send
-                print(e)
+        # Release instants are computed from the start of the competition on the monotonic clock
+        schedule = ReleaseScheduler()
+        if cursor is None:
+            cursor = ReleaseCursor(competition_id)
+
+        first_index = cursor.batch_index + 1
+        reports, first_release = self.release_initial_batch(topic, initial_batch, initial_training_time, cursor,
+                                                            schedule, start_date, first_index * time_interval)
+
+        # Accessing each group: test items with just values and train group with predictions for training
+        for index, (group, train_group, position) in enumerate(batches, first_index):
+            # Test group is released after the initial training time, then one group every time interval
+            release = first_release + (index - first_index) * time_interval
+            lag = schedule.wait_until(release)
+            logging.debug("Batch {} released with {:.3f}s lag".format(index, lag))
+            released_at = datetime.datetime.now()
+            # Every row is encoded only once
+            train_payloads = self.encode(train_group)
+            reports.extend(self.release_test(topic, spark_topic, self.encode(group), train_payloads, released_at,
+                                             predictions_time_interval, competition_id))
 
-        # After sending initial batch, sleep for initial training time
-        time.sleep(int(initial_training_time))
-        # Creating lists of batch size, one for test items with just values and second with predictions for training
-        test_groups = list(self.chunker(items, batch_size))
-        train_groups = list(self.chunker(predictions, batch_size))
+            # Train group is released together with the next test group
+            schedule.wait_until(release + time_interval, record=False)
 
-        i = -1
+            train_report = self.release_train(topic, train_payloads, released_at, predictions_time_interval,
+                                              competition_id)
+            reports.append(train_report)
+            # The release lag is saved with the cursor once the batch has been delivered
+            cursor.release(train_report, index, position, group[-1]['rowID'] + 1, lag)
 
-        # Accessing each group in the list test_groups
-        for group in test_groups:
-            # In parallel accessing the predictions
-            # Adding tag, deadline and released at to every item in train group / prediction
-            released_at = datetime.datetime.now()
-            # for item in test group add tag, deadline and released
-            for item in group:
-                item['tag'] = 'TEST'
-                item['Deadline'] = str(released_at + datetime.timedelta(seconds=int(predictions_time_interval)))
-                item['Released'] = str(released_at)
-                item['competition_id'] = str(competition_id)
-                # Sending testing items
-                try:
-                    self.send(topic, orjson.dumps(item))
-
-                except Exception as e:
-                    print(e)
-
-            i = i + 1
-            train_group = train_groups[i]
-            for item in train_group:
-                deadline = released_at + datetime.timedelta(seconds=int(predictions_time_interval))
-                item['Deadline'] = deadline.strftime("%Y-%m-%d %H:%M:%S")
-                item['Released'] = released_at.strftime("%Y-%m-%d %H:%M:%S")
-                item['competition_id'] = competition_id
-                try:
-                    self.send(spark_topic, orjson.dumps(item))
-                except Exception as e:
-                    print(e)
-
-            time.sleep(time_interval)
-
-            for item in train_group:
-                item['tag'] = 'TRAIN'
-                item['Deadline'] = released_at + datetime.timedelta(seconds=int(predictions_time_interval))
-                item['Released'] = released_at
-                try:
-                    self.send(topic, orjson.dumps(item, default=json_util.default))
-                except Exception as e:
-                    print(e)
+            cursor.track(reports)
+            reports = self.log_reports(reports)
 
         time.sleep(time_interval)
 
         self.producer.flush()
+        cursor.track(reports)
+        cursor.finish()
+        self.log_reports(reports)
+        schedule.log_summary()
+
+    def main_rate(self, topic, initial_batch, batches, initial_training_time, release_rate, time_interval,
+                  predictions_time_interval, spark_topic, competition_id, cursor=None, start_date=None,
+                  batch_size=None):
+        """
+        Recreates the stream at a target rate (records per second) instead of one batch every time interval.
+        The records are paced by a token bucket. Every record is released as test (without the target value) and its
+        train record is released one time interval later, with the same deadline semantics as the batch mode.
+
+        :param topic:
+        :param initial_batch:
+        :param batches: Iterable of (test group, train group, position) tuples, read lazily from the datastream
+        :param initial_training_time:
+        :param release_rate: Target rate, in records per second
+        :param time_interval: Time between the release of a test record and of its train record
+        :param predictions_time_interval:
+        :param spark_topic:
+        :param competition_id:
+        :param cursor: Release cursor, updated every time the train records of a whole batch have been delivered
+        :param start_date: Start date of the competition. A resumed stream releases its records at the instants they
+        had from the start date, the records that are late are released without pacing until the stream has caught up
+        :param batch_size: Number of records in a batch, to compute the instants of a resumed stream
+        :return:
+        """
+        schedule = ReleaseScheduler()
+        if cursor is None:
+            cursor = ReleaseCursor(competition_id)
+
+        elapsed = (cursor.batch_index + 1) * (batch_size or 0) / release_rate
+        reports, first_release = self.release_initial_batch(topic, initial_batch, initial_training_time, cursor,
+                                                            schedule, start_date, elapsed)
+        schedule.wait_until(first_release, record=False)
+
+        bucket = TokenBucket(release_rate, clock=schedule.clock)
+        records = self.records(batches, cursor.batch_index + 1)
+        # Records already late when a stream is resumed, released without waiting for the tokens
+        late = int(max(0.0, schedule.clock() - schedule.start - first_release) * release_rate)
+        released = 0
+        # Train records waiting for their release: (release instant, released at, encoded train records, end of the
+        # last batch completed by the records, release lag of the test records)
+        pending = collections.deque()
+        exhausted = False
+        while not exhausted or pending:
+            now = schedule.clock()
+            while pending and pending[0][0] <= now:
+                release, released_at, train_payloads, batch_end, lag = pending.popleft()
+                train_report = self.release_train(topic, train_payloads, released_at, predictions_time_interval,
+                                                  competition_id)
+                reports.append(train_report)
+                if batch_end is not None:
+                    # The release lag of a batch is the lag of the test records that complete it
+                    cursor.release(train_report, *batch_end, lag=lag)
+            if exhausted and not pending:
+                break
+
+            catching_up = released < late
+            wait = float('inf') if exhausted else 0.0 if catching_up else bucket.wait_time()
+            if pending:
+                wait = min(wait, pending[0][0] - now)
+            if wait > 0:
+                schedule.sleep(wait)
+                continue
+
+            if catching_up:
+                # Nominal instant of the records, at most one second of records is released at once
+                offset = first_release + released / release_rate
+                count = min(late - released, max(1, int(release_rate)))
+            else:
+                offset = now - schedule.start
+                count = bucket.take()
+            chunk = list(itertools.islice(records, count))
+            if not chunk:
+                exhausted = True
+                continue
+            # Release lag of the test records with respect to the target rate
+            lag = max(0.0, now - schedule.start - first_release - released / release_rate)
+            schedule.record(lag)
+            released += len(chunk)
+            payloads = self.encode([item for item, prediction, batch_end in chunk])
+            train_payloads = self.encode([prediction for item, prediction, batch_end in chunk])
+            batch_ends = [batch_end for item, prediction, batch_end in chunk if batch_end is not None]
+            released_at = datetime.datetime.now()
+            reports.extend(self.release_test(topic, spark_topic, payloads, train_payloads, released_at,
+                                             predictions_time_interval, competition_id))
+            pending.append((schedule.start + offset + time_interval, released_at, train_payloads,
+                            batch_ends[-1] if batch_ends else None, lag))
+            cursor.track(reports)
+            reports = self.log_reports(reports)
+
+        self.producer.flush()
+        cursor.track(reports)
+        cursor.finish()
+        self.log_reports(reports)
+        schedule.log_summary()
+
+    def release_initial_batch(self, topic, initial_batch, initial_training_time, cursor, schedule=None,
+                              start_date=None, elapsed=0):
+        """
+        Release the initial batch, unless the stream is resumed: the initial batch and the initial training time
+        have already gone by then.
+
+        :param cursor: Release cursor
+        :param schedule: Release scheduler of the stream
+        :param start_date: Start date of the competition
+        :param elapsed: Time from the end of the initial training time to the release of the first test group of a
+        resumed stream, in seconds
+        :return: Delivery reports of the initial batch and release instant of the first test group, in seconds from
+        the start of the schedule. The release instant of a resumed stream is the one it had from the start date, it
+        is negative if it has already gone by
+        """
+        if cursor.resumed:
+            logging.debug("Stream resumed after batch {}, row {}".format(cursor.batch_index, cursor.row_index))
+            if schedule is None or not isinstance(start_date, datetime.datetime):
+                return [], 0
+            # Wall clock instant converted to the monotonic clock of the schedule
+            nominal = start_date + datetime.timedelta(seconds=int(initial_training_time) + elapsed)
+            return [], (nominal - datetime.datetime.now()).total_seconds() + (schedule.clock() - schedule.start)
+        # Send initial batch as json
+        initial_payloads = self.encode(initial_batch)
+        reports = [self.send_batch(topic, [payload for key, payload in initial_payloads],
+                                   [key for key, payload in initial_payloads])]
+        # The initial batch is delivered during the initial training time
+        self.producer.flush()
+        cursor.track(reports)
+        cursor.save()
+        return self.log_reports(reports), int(initial_training_time)
 
     @staticmethod
-    def chunker(seq, size):
-        """ Returns data in chunks (batches) of a given size. """
-        return (seq[pos:pos + size] for pos in range(0, len(seq), size))
+    def records(batches, first_index):
+        """
+        Flatten the batches into records for the rate-based release.
+
+        :param batches: Iterable of (test group, train group, position) tuples
+        :param first_index: Index of the first batch
+        :return: Generator of (item, prediction, batch end) tuples. The batch end is given on the last record of a
+        batch only, as (batch index, position in the datastream, next rowID), and is None on the other records
+        """
+        for index, (group, train_group, position) in enumerate(batches, first_index):
+            last = len(group) - 1
+            for i, (item, prediction) in enumerate(zip(group, train_group)):
+                batch_end = (index, position, item['rowID'] + 1) if i == last else None
+                yield item, prediction, batch_end
+
+    def release_test(self, topic, spark_topic, payloads, train_payloads, released_at, predictions_time_interval,
+                     competition_id):
+        """
+        Release a test group, and its targets to Spark for the evaluation.
+        The fields that are the same for the whole group (tag, deadline, released, competition) are encoded once and
+        spliced into the already encoded rows.
+
+        :param payloads: Encoded test items, with their keys
+        :param train_payloads: Encoded train items (target values), with their keys
+        :return: Delivery reports of the test group and of the Spark group
+        """
+        deadline = released_at + datetime.timedelta(seconds=int(predictions_time_interval))
+        # Adding tag, deadline and released at to every item in test group
+        test_fields = self.encode_fields({'tag': 'TEST', 'Deadline': str(deadline), 'Released': str(released_at),
+                                          'competition_id': str(competition_id)})
+        # Sending testing items
+        test_report = self.send_batch(topic, [payload[:-1] + test_fields for key, payload in payloads],
+                                      [key for key, payload in payloads])
+
+        spark_fields = self.encode_fields({'Deadline': deadline.strftime("%Y-%m-%d %H:%M:%S"),
+                                           'Released': released_at.strftime("%Y-%m-%d %H:%M:%S"),
+                                           'competition_id': competition_id})
+        spark_report = self.send_batch(spark_topic, [payload[:-1] + spark_fields for key, payload in train_payloads],
+                                       [key for key, payload in train_payloads])
+        return test_report, spark_report
+
+    def release_train(self, topic, train_payloads, released_at, predictions_time_interval, competition_id):
+        """
+        Release a train group (with the target values), after the test group released at released_at.
+
+        :param train_payloads: Encoded train items (target values), with their keys
+        :return: Delivery report of the train group
+        """
+        train_fields = self.encode_fields({'Deadline': released_at + datetime.timedelta(
+            seconds=int(predictions_time_interval)), 'Released': released_at, 'competition_id': competition_id,
+            'tag': 'TRAIN'}, default=json_util.default)
+        return self.send_batch(topic, [payload[:-1] + train_fields for key, payload in train_payloads],
+                               [key for key, payload in train_payloads])
+
+    @staticmethod
+    def encode_fields(fields, default=None):
+        """
+        Encode fields so they can be appended to an encoded json object: the object without its closing brace,
+        followed by the encoded fields, is the object with the fields.
+
+        :param fields: Dictionary with the fields
+        :param default: Serializer for the types not supported by orjson
+        :return: Encoded fields, starting with a comma and ending with the closing brace
+        """
+        return b',' + orjson.dumps(fields, default=default)[1:]
 
     @staticmethod
-    def is_not_empty(row):
-        """Check if row is empty."""
-        return all(item == "" for item in row)
+    def encode(items, default=None):
+        """
+        Serialize the items to json, the items that cannot be serialized are left out.
 
+        :return: List of (key, message) tuples, items are keyed by their rowID
+        """
+        messages = []
+        for item in items:
+            try:
+                messages.append((str(item['rowID']), orjson.dumps(item, default=default)))
+            except Exception as e:
+                logging.debug("Item {} not serialized: {}".format(item.get('rowID'), e))
+        return messages
 
-    def create_competition(self, competition, items, predictions, initial_batch):
-        """Create a competition and start releasing the data stream."""
+    @staticmethod
+    def log_reports(reports):
+        """
+        Log the number of delivered and failed messages of the batches that are done.
+
+        :param reports: Delivery reports of the batches
+        :return: Delivery reports of the batches still in flight
+        """
+        pending = []
+        for report in reports:
+            if report.done():
+                logging.debug("Batch published to {}: {} delivered, {} failed".format(report.topic, report.delivered,
+                                                                                      report.failed))
+            else:
+                pending.append(report)
+        return pending
+
+    def create_competition(self, competition, initial_batch, batches, cursor=None):
+        """Create a competition and start releasing the data stream, from the release cursor if it is resumed."""
+        if competition.release_rate:
+            self.main_rate(
+                topic=competition.name.lower().replace(" ", ""),
+                initial_training_time=competition.initial_training_time,
+                initial_batch=initial_batch,
+                batches=batches,
+                release_rate=competition.release_rate,
+                time_interval=competition.time_interval,
+                predictions_time_interval=competition.predictions_time_interval,
+                spark_topic=competition.name.lower().replace(" ", "") + 'spark_train',
+                competition_id=competition.competition_id,
+                cursor=cursor,
+                start_date=competition.start_date,
+                batch_size=competition.batch_size)
+            return
         self.main(
             topic=competition.name.lower().replace(" ", ""),
             initial_training_time=competition.initial_training_time,
             initial_batch=initial_batch,
-            items=items,
-            predictions=predictions,
-            batch_size=competition.batch_size,
+            batches=batches,
             time_interval=competition.time_interval,
             predictions_time_interval=competition.predictions_time_interval,
             spark_topic=competition.name.lower().replace(" ", "") + 'spark_train',
-            competition_id=competition.competition_id)
+            competition_id=competition.competition_id,
+            cursor=cursor,
+            start_date=competition.start_date)
 
 
 class Scheduler:
@@ -546,9 +1326,35 @@ class Scheduler:
 
     def start(self):
         """
-        Starts the scheduler.
+        Starts the scheduler, and the gRPC server workers that serve the participants of all the competitions. The
+        topic of the subscription events is created before the workers subscribe to it.
         """
         self.scheduler.start()
+        try:
+            _provision_subscription_events_topic()
+        except Exception as e:
+            logging.debug("Topic {} not created: {}".format(SUBSCRIPTION_EVENTS_TOPIC, e))
+        supervisor = threading.Thread(target=_supervise_stream_servers, args=(_GRPC_WORKERS,))
+        supervisor.daemon = True
+        supervisor.start()
+
+    def resume_competitions(self):
+        """
+        Resumes the competitions that were running when the application stopped. Their stream is resumed from the
+        release cursor saved by the producer, instead of being released again from the first row.
+        """
+        repository = MongoRepository(_MONGO_HOST)
+        for competition in _COMPETITION_REPO.get_active_competitions():
+            try:
+                cursor = repository.get_release_cursor(competition.competition_id)
+                if cursor is None or cursor.get('finished', False):
+                    continue
+                measures = repository.get_competition_evaluation_measures(competition.competition_id)
+            except Exception as e:
+                logging.debug("Competition {} not resumed: {}".format(competition.competition_id, e))
+                continue
+            self.scheduler.add_job(_create_competition, args=[competition, measures['measures'], True],
+                                   id=str(competition.name) + '_resume', replace_existing=True)
 
     def _stop_competition(self, job_id, end_date):
         """
@@ -0,0 +1,204 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import struct
+from google.protobuf import json_format
+from google.protobuf.descriptor import FieldDescriptor
+
+"""
+Protobuf codec module.
+Conversion between dictionaries and the protobuf messages of a competition, without going through JSON text. The
+conversion of every field is compiled once from the message descriptor of the uploaded .proto file.
+
+Scalar fields are converted directly. Repeated, map, enum, bytes and message fields, as well as the values that can
+not be converted directly, are left to json_format, with the same result as the JSON conversion.
+
+Messages that are already serialized are assembled into a repeated field without being parsed again.
+"""
+
+_INTEGER_TYPES = {FieldDescriptor.TYPE_INT32, FieldDescriptor.TYPE_INT64, FieldDescriptor.TYPE_UINT32,
+                  FieldDescriptor.TYPE_UINT64, FieldDescriptor.TYPE_SINT32, FieldDescriptor.TYPE_SINT64,
+                  FieldDescriptor.TYPE_FIXED32, FieldDescriptor.TYPE_FIXED64, FieldDescriptor.TYPE_SFIXED32,
+                  FieldDescriptor.TYPE_SFIXED64}
+_FLOAT_TYPES = {FieldDescriptor.TYPE_FLOAT, FieldDescriptor.TYPE_DOUBLE}
+
+
+def _to_string(value):
+    # Numbers are sent as text in the string fields
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    raise TypeError(value)
+
+
+def _to_integer(value):
+    if isinstance(value, bool):
+        raise TypeError(value)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return int(value)
+    raise TypeError(value)
+
+
+def _to_float(value):
+    if isinstance(value, bool):
+        raise TypeError(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return float(value)
+    raise TypeError(value)
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    raise TypeError(value)
+
+
+def _shortest_float(value):
+    """Shortest representation of a float32 value, as written by json_format."""
+    if not math.isfinite(value):
+        return value
+    for precision in range(6, 10):
+        candidate = float('{:.{}g}'.format(value, precision))
+        if struct.unpack('<f', struct.pack('<f', candidate))[0] == value:
+            return candidate
+    return value
+
+
+def _varint(value):
+    """Protobuf encoding of an unsigned integer."""
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def repeated_messages(serialized_messages, field_number=1):
+    """
+    Serialized repeated message field, e.g. a MessageBatch, from messages that are already serialized.
+
+    :param serialized_messages: Serialized messages
+    :param field_number: Number of the repeated field
+    :return: Serialized message that holds only the repeated field
+    """
+    # Length-delimited wire type
+    tag = _varint(field_number << 3 | 2)
+    parts = []
+    for message in serialized_messages:
+        parts.append(tag)
+        parts.append(_varint(len(message)))
+        parts.append(message)
+    return b''.join(parts)
+
+
+def _converter(field):
+    """
+    Converter of the values of a field, None if the field is not converted directly.
+
+    :param field: Field descriptor
+    :return: Conversion function
+    """
+    # Recent protobuf versions replace the label of the fields by is_repeated
+    repeated = field.is_repeated if hasattr(field, 'is_repeated') else field.label == FieldDescriptor.LABEL_REPEATED
+    if repeated:
+        return None
+    if field.type == FieldDescriptor.TYPE_STRING:
+        return _to_string
+    if field.type in _INTEGER_TYPES:
+        return _to_integer
+    if field.type in _FLOAT_TYPES:
+        return _to_float
+    if field.type == FieldDescriptor.TYPE_BOOL:
+        return _to_bool
+    return None
+
+
+class MessageCodec:
+    """
+    Codec of one protobuf message type of a competition.
+    """
+
+    def __init__(self, message_class):
+        """
+        Compile the conversion of every field of the message.
+
+        :param message_class: Protobuf message class, e.g. file_pb2.Message
+        """
+        self.message_class = message_class
+        descriptor = message_class.DESCRIPTOR
+        # Fields are found by their name or their JSON name, as json_format does
+        self.setters = {}
+        self.getters = []
+        self.other_fields = False
+        for field in descriptor.fields:
+            converter = _converter(field)
+            if converter is None:
+                self.other_fields = True
+                continue
+            self.setters[field.name] = (field.name, converter)
+            self.setters[field.json_name] = (field.name, converter)
+            self.getters.append((field.name, field.json_name, field.type == FieldDescriptor.TYPE_FLOAT))
+
+    def parse(self, values):
+        """
+        Create a message from a dictionary. Unknown keys are ignored and null values leave the field unset.
+
+        :param values: Dictionary of field values
+        :return: Message
+        """
+        message = self.message_class()
+        others = None
+        for key, value in values.items():
+            setter = self.setters.get(key)
+            if setter is None:
+                if self.other_fields:
+                    others = others or {}
+                    others[key] = value
+                continue
+            if value is None:
+                continue
+            try:
+                setattr(message, setter[0], setter[1](value))
+            except (TypeError, ValueError):
+                # json_format converts the value or raises its own error
+                others = others or {}
+                others[key] = value
+        if others:
+            json_format.ParseDict(others, message, ignore_unknown_fields=True)
+        return message
+
+    def to_dict(self, message):
+        """
+        Dictionary of the fields of a message, with the JSON names of the fields as keys.
+
+        :param message: Message
+        :return: Dictionary of field values. The scalar fields are always present, even with their default value
+        """
+        document = {}
+        for name, json_name, is_float in self.getters:
+            value = getattr(message, name)
+            document[json_name] = _shortest_float(value) if is_float else value
+        if self.other_fields:
+            for key, value in json_format.MessageToDict(message).items():
+                document.setdefault(key, value)
+        return document
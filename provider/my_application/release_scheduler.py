@@ -0,0 +1,152 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import time
+import logging
+
+"""
+Release scheduler module.
+Paces the release of the stream batches on the monotonic clock, or of the records at a target rate.
+"""
+
+
+class ReleaseScheduler:
+    """
+    Release scheduler.
+
+    Release instants are absolute offsets from the start of the competition, so the time spent serializing and
+    publishing the batches does not accumulate over the competition. The release lag (how late a batch has been
+    released with respect to its nominal release instant) is recorded for every test release. The train releases are
+    not recorded, their waits would blend with the lag of the test releases.
+    """
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        """
+        Start the schedule now.
+
+        :param clock: Monotonic clock, in seconds
+        :param sleep: Sleep function, in seconds
+        """
+        self.clock = clock
+        self.sleep = sleep
+        self.start = clock()
+        self.count = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    def wait_until(self, offset, record=True):
+        """
+        Sleep until the release instant.
+
+        :param offset: Release instant, in seconds from the start of the schedule
+        :param record: Record the release lag, False for the releases that are not test releases
+        :return: Release lag in seconds
+        """
+        release = self.start + offset
+        remaining = release - self.clock()
+        if remaining > 0:
+            self.sleep(remaining)
+        lag = max(0.0, self.clock() - release)
+        if record:
+            self.record(lag)
+        return lag
+
+    def record(self, lag):
+        """
+        Record the lag of a test release.
+
+        :param lag: Release lag in seconds
+        """
+        self.count += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+
+    def mean_lag(self):
+        """Mean release lag over all the releases, in seconds."""
+        if self.count == 0:
+            return 0.0
+        return self.total_lag / self.count
+
+    def log_summary(self):
+        logging.debug("Releases: {}, mean lag: {:.3f}s, max lag: {:.3f}s".format(self.count, self.mean_lag(),
+                                                                                  self.max_lag))
+
+
+class TokenBucket:
+    """
+    Token bucket for rate-based releases.
+
+    Tokens are added continuously at the target rate (records per second), up to a small burst capacity, so records
+    can be released with sub-second granularity without sleeping once per record.
+    """
+
+    def __init__(self, rate, burst=0.01, clock=time.monotonic):
+        """
+        :param rate: Target rate, in records per second
+        :param burst: Capacity of the bucket, in seconds of the target rate (at least one token)
+        :param clock: Monotonic clock, in seconds
+        """
+        self.rate = float(rate)
+        self.capacity = max(1.0, self.rate * burst)
+        self.clock = clock
+        self.tokens = 1.0
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """Time to wait, in seconds, until at least one token is available."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        """
+        Take all the whole tokens that are available, without waiting.
+
+        :return: Number of records that can be released now
+        """
+        self._refill()
+        tokens = int(self.tokens)
+        self.tokens -= tokens
+        return tokens
+
+
+def parse_release_rate(release_rate):
+    """
+    Check the release rate of a competition.
+
+    :param release_rate: Release rate in records per second, a number or a numeric string. None or '' if the stream
+    is released in batches
+    :return: Release rate as a float, None if the stream is released in batches
+    :raises ValueError: If the release rate is not a finite number greater than 0
+    """
+    if release_rate is None or release_rate == '':
+        return None
+    if isinstance(release_rate, bool) or not isinstance(release_rate, (int, float, str)):
+        raise ValueError("The release rate must be a number of records per second")
+    try:
+        rate = float(release_rate)
+    except ValueError:
+        raise ValueError("The release rate must be a number of records per second")
+    if not math.isfinite(rate):
+        raise ValueError("The release rate must be a finite number of records per second")
+    if rate <= 0:
+        raise ValueError("The release rate must be greater than 0")
+    return rate
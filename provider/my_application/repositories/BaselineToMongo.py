@@ -35,12 +35,22 @@ try:
 except Exception:
     _MONGO_HOST = config['MONGO_HOST']
 
+# Maximum time (in seconds) a poll blocks without any message
+_POLL_TIMEOUT = 1.0
+
 
 class BaselineToMongo:
     consumer = None
     mongo_repository = None
 
-    def __init__(self, kafka_server, topic, competition, competition_config):
+    def __init__(self, kafka_server, topic, competition, competition_config, profile=None):
+        """
+        :param kafka_server: Kafka server IP address
+        :param topic: Topic of the competition stream
+        :param competition: Competition object
+        :param competition_config: Competition configuration
+        :param profile: Profile of the datastream, the classes of the targets are known from the start
+        """
         conf = {'bootstrap.servers': kafka_server, 'group.id': 'baseline',
                 'session.timeout.ms': competition.initial_training_time * 10000,
                 'auto.offset.reset': 'earliest', 'allow.auto.create.topics': True}
@@ -49,6 +59,7 @@ class BaselineToMongo:
         self.config = competition_config
         self.targets = competition_config.keys()
         self.competition_id = competition.competition_id
+        self.profile = profile
         conf_producer = {'bootstrap.servers': kafka_server}
         self.producer = Producer(conf_producer)
         self.output_topic = competition.name.lower().replace(" ", "") + 'predictions'
@@ -69,13 +80,21 @@ class BaselineToMongo:
 
         for target in classification_targets:
             target_dict[target] = {}
+            # Known classes start with no vote, so there is a majority class before the first training record
+            classes = None
+            if self.profile is not None:
+                classes = self.profile['columns'].get(target.replace(' ', ''), {}).get('classes')
+            for target_class in classes or []:
+                target_dict[target][str(target_class)] = 0
         for target in regression_targets:
             num_records[target] = 0
             sum_values[target] = 0
 
         while True:
             try:
-                msg = self.consumer.poll(timeout=0)
+                msg = self.consumer.poll(timeout=_POLL_TIMEOUT)
+                if msg is None:
+                    continue
                 message = orjson.loads(msg.value())
                 prediction_dict = {'rowID': message['rowID'],
                                    'prediction_competition_id': self.competition_id, 'user_id': 0}
@@ -87,7 +106,8 @@ class BaselineToMongo:
                     submitted_on = datetime.datetime.now()
                     prediction_dict['submitted_on'] = submitted_on.strftime("%Y-%m-%d %H:%M:%S")
                     # print(prediction_dict)
-                    self.producer.produce(self.output_topic, orjson.dumps(prediction_dict))
+                    self.producer.produce(self.output_topic, orjson.dumps(prediction_dict),
+                                          key=str(prediction_dict['user_id']))
                     self.producer.poll(timeout=0)
             except Exception as e:
                 continue
@@ -21,9 +21,11 @@ from sqlalchemy import Column, DateTime, ForeignKey, func
 from sqlalchemy.orm import relationship
 from sqlalchemy import UniqueConstraint
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy.types import Integer, String, Boolean
+from sqlalchemy.types import Integer, String, Boolean, Float, Text
 from datetime import datetime
+import json
 from sqlalchemy import and_
+from sqlalchemy import inspect, text
 
 _BASE = declarative_base()
 
@@ -44,6 +46,7 @@ class Competition(_BASE):
     file_path = Column(String(255))
     description = Column(String(255))
     code = Column(String(10))
+    release_rate = Column(Float, nullable=True)
 
     __table_args__ = (UniqueConstraint('name'),
                       )
@@ -52,7 +55,7 @@ class Competition(_BASE):
 
     def __init__(self, competition_id, name, datastream_id, initial_batch_size, initial_training_time, batch_size,
                  time_interval, start_date, end_date, target_class, file_path, predictions_time_interval, description,
-                 code):
+                 code, release_rate=None):
         """
         Construct a class for Competition table.
         :param competition_id:
@@ -69,6 +72,7 @@ class Competition(_BASE):
         :param predictions_time_interval:
         :param description:
         :param code: Competition code
+        :param release_rate: Records released per second, if the stream is released at a rate instead of in batches
         """
         self.competition_id = competition_id
         self.name = name
@@ -84,6 +88,7 @@ class Competition(_BASE):
         self.predictions_time_interval = predictions_time_interval
         self.description = description
         self.code = code
+        self.release_rate = release_rate
 
     def serialize(self):
         # print (self.target_class)
@@ -100,7 +105,8 @@ class Competition(_BASE):
             'target_class': self.target_class,
             'predictions_time_interval': self.predictions_time_interval,
             'description': self.description,
-            'code': self.code
+            'code': self.code,
+            'release_rate': self.release_rate
         }
 
 
@@ -110,25 +116,39 @@ class Datastream(_BASE):
     name = Column(String(64))
     file_path = Column(String(255))
     description = Column(String(255))
+    content_hash = Column(String(64))
+    # Profile of the datastream file (row count, type, cardinality and classes of the columns), as json
+    profile = Column(Text(16777215))
     competitions = relationship("Competition", back_populates='datastream', lazy='dynamic')
 
     __table_args__ = (UniqueConstraint('name'),)
 
-    def __init__(self, datastream_id, name, description, file_path):
+    def __init__(self, datastream_id, name, description, file_path, content_hash=None, profile=None):
         """
         Construct a class for Datastream table.
         :param datastream_id:
         :param name:
         :param description:
         :param file_path:
+        :param content_hash: Hash of the datastream file, it identifies its compiled cache
+        :param profile: Profile of the datastream file, dictionary
         """
         self.datastream_id = datastream_id
         self.name = name
         self.description = description
         self.file_path = file_path
+        self.content_hash = content_hash
+        self.profile = json.dumps(profile) if profile is not None else None
+
+    def get_profile(self):
+        """Profile of the datastream file, None if the file has not been profiled."""
+        if self.profile is None:
+            return None
+        return json.loads(self.profile)
 
     def serialize(self):
-        return {'datastream_id': self.datastream_id, 'name': self.name, 'description': self.description}
+        return {'datastream_id': self.datastream_id, 'name': self.name, 'description': self.description,
+                'profile': self.get_profile()}
 
 
 class User(_BASE):
@@ -208,6 +228,37 @@ class Subscription(_BASE):
         self.user_id = user_id
 
 
+# Columns added to the tables after their first release. create_all only creates the missing tables, these columns are
+# added to the tables of the existing databases by migrate_tables
+_ADDED_COLUMNS = [Datastream.__table__.c.content_hash, Datastream.__table__.c.profile,
+                  Competition.__table__.c.release_rate]
+
+
+def migrate_tables(engine):
+    """
+    Add the missing columns of _ADDED_COLUMNS to the existing tables (ALTER TABLE ... ADD COLUMN). The added columns
+    are nullable, the existing rows get NULL values.
+
+    :param engine: Engine of the database
+    :return:
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    preparer = engine.dialect.identifier_preparer
+    for column in _ADDED_COLUMNS:
+        table = column.table.name
+        if table not in tables or column.name in {c['name'] for c in inspector.get_columns(table)}:
+            continue
+        statement = 'ALTER TABLE {} ADD COLUMN {} {}'.format(preparer.quote(table), preparer.quote(column.name),
+                                                             column.type.compile(dialect=engine.dialect))
+        try:
+            with engine.begin() as connection:
+                connection.execute(text(statement))
+        except Exception as e:
+            # The column may have been added by another process in the meantime
+            print(e)
+
+
 class BaseRepository():
     """
     Repository base class.
@@ -222,13 +273,24 @@ class BaseRepository():
     """
     instance = None
 
-    def __init__(self, host, dbname):
+    def __init__(self, host, dbname, engine=None):
+        """
+        :param host: Database server
+        :param dbname: Database name
+        :param engine: Engine shared by several repositories, with its connection pool. By default the repository
+        creates its own engine and the tables
+        """
         self.instance = None
-        self.engine = create_engine(host + dbname)
+        self.shared_engine = engine is not None
+        if engine is None:
+            engine = create_engine(host + dbname)
+        self.engine = engine
         self.sessionmaker = sessionmaker()
         self.sessionmaker.configure(bind=self.engine)
         self.Base = _BASE
-        self.Base.metadata.create_all(self.engine)
+        if not self.shared_engine:
+            self.Base.metadata.create_all(self.engine)
+            migrate_tables(self.engine)
 
         if not self.instance:
             self.session = self.sessionmaker()
@@ -256,7 +318,9 @@ class BaseRepository():
 
     def cleanup(self):
         self.session.close()
-        self.engine.dispose()
+        # A shared engine keeps its connections in the pool for the next repositories
+        if not self.shared_engine:
+            self.engine.dispose()
 
 
 class CompetitionRepository(BaseRepository):
@@ -276,10 +340,12 @@ class CompetitionRepository(BaseRepository):
     get_competition_by_code(): Retrieve the competition by code
 
     get_competitions_by_user(): Retrieve competition for a given user
+
+    get_active_competitions(): Retrieve the competitions that are running
     """
 
-    def __init__(self, host, dbname):
-        BaseRepository.__init__(self, host, dbname)
+    def __init__(self, host, dbname, engine=None):
+        BaseRepository.__init__(self, host, dbname, engine)
 
     def get_competition_by_id(self, competition_id):
         results = self.session.query(Competition).filter_by(competition_id=competition_id)
@@ -337,6 +403,16 @@ class CompetitionRepository(BaseRepository):
         else:
             return {'data': [], 'total': 0}
 
+    def get_active_competitions(self):
+        now = datetime.now()
+        results = []
+        try:
+            results = self.session.query(Competition).filter(and_(Competition.end_date > now,
+                                                                  Competition.start_date < now)).all()
+        except Exception:
+            self.session.rollback()
+        return results
+
     def get_competition_by_code(self, code):
         results = self.session.query(Competition).filter_by(code=code)
         try:
@@ -423,8 +499,8 @@ class DatastreamRepository(BaseRepository):
     get_competitions_by_user(): Retrieve competition for a given user
     """
 
-    def __init__(self, host, dbname):
-        BaseRepository.__init__(self, host, dbname)
+    def __init__(self, host, dbname, engine=None):
+        BaseRepository.__init__(self, host, dbname, engine)
 
     def get_datastream_by_id(self, datastream_id):
         results = None
@@ -437,6 +513,17 @@ class DatastreamRepository(BaseRepository):
         else:
             return results
 
+    def set_datastream_profile(self, datastream_id, content_hash, profile):
+        """
+        Store the content hash and the profile of a datastream, once its file has been profiled and compiled.
+        :param datastream_id: Datastream ID
+        :param content_hash: Content hash of the datastream file, None if the file is not compiled
+        :param profile: Profile of the datastream, None if the file could not be profiled
+        """
+        self.session.query(Datastream).filter_by(datastream_id=datastream_id).update(
+            {'content_hash': content_hash, 'profile': json.dumps(profile) if profile is not None else None})
+        self.session.commit()
+
     def get_all_datastreams(self, page=None, step=None):
         results = None
         try:
@@ -475,8 +562,8 @@ class UserRepository(BaseRepository):
 
     confirm_user(): Manually confirm user's registration
     """
-    def __init__(self, host, dbname):
-        BaseRepository.__init__(self, host, dbname)
+    def __init__(self, host, dbname, engine=None):
+        BaseRepository.__init__(self, host, dbname, engine)
     def get_user_by_id(self, id):
         results = None
         try:
@@ -526,8 +613,8 @@ class SubscriptionRepository(BaseRepository):
 
     get_subscription(): Retrieve the subscription for a user
     """
-    def __init__(self, host, dbname):
-        BaseRepository.__init__(self, host, dbname)
+    def __init__(self, host, dbname, engine=None):
+        BaseRepository.__init__(self, host, dbname, engine)
 
     def get_competition_subscribers(self, competition_id):
         users = None
@@ -28,6 +28,9 @@ try:
 except Exception:
     _MONGO_HOST = config['MONGO_HOST']
 
+# Maximum time (in seconds) a poll blocks without any message
+_POLL_TIMEOUT = 1.0
+
 
 class ConsumerToMongo:
     """
@@ -56,7 +59,7 @@ class ConsumerToMongo:
 
         while True:
             try:
-                msg = self.consumer.poll(timeout=0)
+                msg = self.consumer.poll(timeout=_POLL_TIMEOUT)
             except Exception as e:
                 continue
             if msg is not None:
@@ -92,6 +92,52 @@ class MongoRepository:
 
         return record
 
+    def create_competition_data(self, competition_id):
+        """
+        Create the data document of a competition (db name: data, collection name: data), unless it already exists:
+        every gRPC server worker creates it when it starts serving the competition.
+        :param competition_id: Competition ID
+        :return:
+        """
+        db = self.client['data']
+        collection = db['data']
+        collection.update_one({'competition_id': str(competition_id)}, {'$setOnInsert': {'dataset': []}}, upsert=True)
+
+    def save_release_cursor(self, competition_id, cursor):
+        """
+        Store the release cursor of a competition stream: how far the stream has been released.
+        :param competition_id: Competition ID
+        :param cursor: Dictionary with the cursor fields
+        :return:
+        """
+        db = self.client['data']
+        collection = db['release_cursors']
+        collection.update_one({'competition_id': int(competition_id)}, {'$set': cursor}, upsert=True)
+
+    def get_release_cursor(self, competition_id):
+        """
+        Fetch the release cursor of a competition stream.
+        :param competition_id: Competition ID
+        :return: Dictionary with the cursor fields, None if the stream has not been released yet
+        """
+        db = self.client['data']
+        collection = db['release_cursors']
+        return collection.find_one({'competition_id': int(competition_id)}, {'_id': 0})
+
+    def get_release_lag(self, competition_id):
+        """
+        Fetch the release lag of a competition stream, saved with its release cursor.
+        :param competition_id: Competition ID
+        :return: Dictionary with the number of batches delivered, the mean, max and last release lag in seconds and
+        the index of the last batch, None if the stream has not been released yet
+        """
+        db = self.client['data']
+        collection = db['release_cursors']
+        cursor = collection.find_one({'competition_id': int(competition_id)}, {'_id': 0, 'release_lag': 1})
+        if cursor is None:
+            return None
+        return cursor.get('release_lag')
+
     def get_standard_evaluation_measures(self):
         """
         Retrieve the standard set of evaluation metrics offered on the platform.
@@ -31,6 +31,9 @@ try:
 except Exception:
     _MONGO_HOST = config['MONGO_HOST']
 
+# Maximum time (in seconds) a poll blocks without any message
+_POLL_TIMEOUT = 1.0
+
 
 class SparkToMongo:
     """
@@ -135,7 +138,7 @@ class SparkToMongo:
         previous = 0
         date = datetime.datetime.now()
         while True:
-            msg = self.consumer.poll(timeout=0)
+            msg = self.consumer.poll(timeout=_POLL_TIMEOUT)
             if msg is None:
                 continue
             if msg.topic() == self.measures_topic:
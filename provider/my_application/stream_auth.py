@@ -0,0 +1,205 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+import time
+import orjson
+from confluent_kafka import Consumer
+from sqlalchemy import create_engine
+from repositories.CompetitionRepository import SubscriptionRepository, UserRepository, CompetitionRepository
+from subscription_auth import decode_subscription_token
+import logging
+
+"""
+Stream authentication module.
+Authentication of the gRPC calls of the participants: users, competitions, subscriptions and subscription tokens are
+looked up through one pooled database engine per process, and cached for a limited time.
+
+Only the positive lookups are cached, so a user who has just registered or subscribed is not rejected. A deleted
+subscription is removed from the caches of all the gRPC processes through the SUBSCRIPTION_EVENTS_TOPIC Kafka topic.
+"""
+
+# Kafka topic of the deleted subscriptions
+SUBSCRIPTION_EVENTS_TOPIC = 'subscription_events'
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Least recently used cache whose entries expire after a time to live.
+    """
+
+    def __init__(self, max_size, ttl, clock=time.monotonic):
+        """
+        :param max_size: Maximum number of entries, the least recently used entries are removed first
+        :param ttl: Time to live of the entries, in seconds
+        :param clock: Monotonic clock, in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :param key: Key of the entry
+        :return: Value of the entry, _MISSING if there is no entry or if it has expired
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires = entry
+            if self.clock() >= expires:
+                del self.entries[key]
+                return _MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, self.clock() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+class StreamAuthenticator:
+    """
+    Cached lookups of the credentials of the participants, for one gRPC process.
+    """
+
+    def __init__(self, host, dbname, ttl=60, max_size=10000):
+        """
+        :param host: Database server
+        :param dbname: Database name
+        :param ttl: Time to live of the cached lookups, in seconds
+        :param max_size: Maximum number of cached lookups of every kind
+        """
+        self.host = host
+        self.dbname = dbname
+        # Connections are checked before being reused, the server closes the idle ones
+        self.engine = create_engine(host + dbname, pool_pre_ping=True, pool_recycle=3600)
+        self.users = TTLCache(max_size, ttl)
+        self.competitions = TTLCache(max_size, ttl)
+        self.subscriptions = TTLCache(max_size, ttl)
+        self.tokens = TTLCache(max_size, ttl)
+
+    def _lookup(self, cache, key, repository_class, query):
+        value = cache.get(key)
+        if value is not _MISSING:
+            return value
+        repository = repository_class(self.host, self.dbname, engine=self.engine)
+        try:
+            # The attributes are loaded by the query, the object is used detached once the session is closed
+            value = query(repository)
+        finally:
+            repository.cleanup()
+        if value is not None:
+            cache.put(key, value)
+        return value
+
+    def user(self, email):
+        """
+        :param email: User email, sent as user_id
+        :return: User, None if there is no such user
+        """
+        return self._lookup(self.users, email, UserRepository,
+                            lambda repository: repository.get_user_by_email(email))
+
+    def competition(self, code):
+        """
+        :param code: Competition code, sent as competition_id
+        :return: Competition, None if there is no such competition
+        """
+        return self._lookup(self.competitions, code, CompetitionRepository,
+                            lambda repository: repository.get_competition_by_code(code))
+
+    def subscription(self, competition_id, user_id):
+        """
+        :param competition_id: Competition ID
+        :param user_id: User ID
+        :return: Subscription, None if the user is not subscribed to the competition
+        """
+        return self._lookup(self.subscriptions, (int(competition_id), int(user_id)), SubscriptionRepository,
+                            lambda repository: repository.get_subscription(competition_id, user_id))
+
+    def decode_token(self, token):
+        """
+        :param token: Subscription token
+        :return: Payload of the token, None if the token is not valid
+        """
+        payload = self.tokens.get(token)
+        if payload is not _MISSING:
+            return payload
+        decoded_token = decode_subscription_token(token)
+        if decoded_token is None:
+            return None
+        self.tokens.put(token, decoded_token[1])
+        return decoded_token[1]
+
+    def invalidate_subscription(self, competition_id, user_id):
+        self.subscriptions.invalidate((int(competition_id), int(user_id)))
+
+    def watch_subscription_events(self, server, poll_timeout=1.0, worker=0):
+        """
+        Start the thread that removes the deleted subscriptions from the cache.
+
+        :param server: Kafka server IP address
+        :param poll_timeout: Maximum time (in seconds) a poll of the topic blocks without any event
+        :param worker: Slot of the gRPC server worker, it names the consumer group
+        :return:
+        """
+        thread = threading.Thread(target=self._watch, args=(server, poll_timeout, worker), name='subscription-events')
+        thread.daemon = True
+        thread.start()
+
+    def _watch(self, server, poll_timeout, worker):
+        # One consumer group per worker slot: every worker receives all the events, a restarted worker takes over the
+        # group of the worker it replaces
+        group = SUBSCRIPTION_EVENTS_TOPIC + '-' + str(worker)
+        consumer = Consumer({'group.id': group, 'group.instance.id': group,
+                             'bootstrap.servers': server, 'auto.offset.reset': 'latest',
+                             'enable.auto.commit': False})
+        consumer.subscribe([SUBSCRIPTION_EVENTS_TOPIC])
+        while True:
+            message = consumer.poll(timeout=poll_timeout)
+            if message is None:
+                continue
+            if message.error():
+                logging.debug("Subscription events consumer error: {}".format(message.error()))
+                continue
+            try:
+                event = orjson.loads(message.value())
+                self.invalidate_subscription(event['competition_id'], event['user_id'])
+            except Exception as e:
+                logging.debug("Wrong subscription event: {}".format(e))
+
+
+def subscription_deleted_event(competition_id, user_id):
+    """
+    Event published to SUBSCRIPTION_EVENTS_TOPIC when a subscription is deleted.
+
+    :param competition_id: Competition ID
+    :param user_id: User ID
+    :return: Event in byte format
+    """
+    return orjson.dumps({'event': 'deleted', 'competition_id': int(competition_id), 'user_id': int(user_id)})
@@ -0,0 +1,226 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import collections
+import threading
+from confluent_kafka import Consumer
+import logging
+
+"""
+Stream hub module.
+Fan-out of the competition stream to the participants connected to the gRPC server: the stream is read from Kafka by
+a single consumer, every record is encoded once and handed to each connected participant through its own bounded
+queue.
+"""
+
+
+class Subscription:
+    """
+    Queue of the records to be sent to one participant.
+
+    The queue is bounded: when a participant does not keep up with the stream, its oldest records are dropped, the
+    other participants are not slowed down.
+    """
+
+    def __init__(self, size):
+        """
+        :param size: Maximum number of records waiting in the queue
+        """
+        self.queue = collections.deque(maxlen=size)
+        self.condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, record):
+        with self.condition:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(record)
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """
+        Take the next record, waiting for it if the queue is empty.
+
+        :param timeout: Maximum time to wait, in seconds
+        :return: The record, or None if there is no record after the timeout
+        """
+        with self.condition:
+            if not self.queue:
+                self.condition.wait(timeout)
+            if self.queue:
+                return self.queue.popleft()
+            return None
+
+    def get_many(self, max_count, timeout=None):
+        """
+        Take the records that are in the queue, waiting for the first one if the queue is empty.
+
+        :param max_count: Maximum number of records taken
+        :param timeout: Maximum time to wait, in seconds
+        :return: List of the records, empty if there is no record after the timeout
+        """
+        with self.condition:
+            if not self.queue:
+                self.condition.wait(timeout)
+            return [self.queue.popleft() for _ in range(min(max_count, len(self.queue)))]
+
+
+class AsyncSubscription(Subscription):
+    """
+    Subscription read by a coroutine: the records are awaited on the event loop, without blocking a thread.
+    """
+
+    def __init__(self, size, loop):
+        """
+        :param size: Maximum number of records waiting in the queue
+        :param loop: Event loop of the coroutine reading the records
+        """
+        Subscription.__init__(self, size)
+        self.loop = loop
+        self.event = asyncio.Event()
+        self.waiting = False
+
+    def put(self, record):
+        with self.condition:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(record)
+            # The event loop is woken up only when the reader waits for a record
+            if self.waiting:
+                self.waiting = False
+                self.loop.call_soon_threadsafe(self.event.set)
+
+    async def _wait(self, timeout):
+        with self.condition:
+            if self.queue:
+                return
+            self.event.clear()
+            self.waiting = True
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def get_async(self, timeout=None):
+        """
+        Coroutine version of get.
+
+        :param timeout: Maximum time to wait, in seconds
+        :return: The record, or None if there is no record after the timeout
+        """
+        await self._wait(timeout)
+        with self.condition:
+            if self.queue:
+                return self.queue.popleft()
+            return None
+
+    async def get_many_async(self, max_count, timeout=None):
+        """
+        Coroutine version of get_many.
+
+        :param max_count: Maximum number of records taken
+        :param timeout: Maximum time to wait, in seconds
+        :return: List of the records, empty if there is no record after the timeout
+        """
+        await self._wait(timeout)
+        with self.condition:
+            return [self.queue.popleft() for _ in range(min(max_count, len(self.queue)))]
+
+
+class StreamHub:
+    """
+    Single Kafka consumer of a competition stream, shared by all the participants connected to the process.
+
+    The consumer is started with the first subscription and reads the stream from its end, as the consumers of the
+    participants used to. The load on the broker does not depend on the number of participants.
+    """
+
+    def __init__(self, server, topic, queue_size, poll_timeout=1.0, encode=None, worker=0):
+        """
+        :param server: Kafka server IP address
+        :param topic: Topic of the competition stream
+        :param queue_size: Size of the queue of every subscription
+        :param poll_timeout: Maximum time (in seconds) a poll of the stream blocks without any record
+        :param encode: Encoding of the records (Kafka message values) for the participants, the records are handed
+        over as they are by default
+        :param worker: Slot of the gRPC server worker
+        """
+        self.server = server
+        self.worker = worker
+        self.topic = topic
+        self.queue_size = queue_size
+        self.poll_timeout = poll_timeout
+        self.encode = encode
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+
+    def subscribe(self, loop=None):
+        """
+        Subscribe to the stream.
+
+        :param loop: Event loop, for a subscription read by a coroutine
+        :return: Subscription, its queue receives every record read from now on
+        """
+        if loop is None:
+            subscription = Subscription(self.queue_size)
+        else:
+            subscription = AsyncSubscription(self.queue_size, loop)
+        with self.lock:
+            self.subscriptions.add(subscription)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='stream-hub-' + self.topic)
+                self.thread.daemon = True
+                self.thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+        if subscription.dropped:
+            logging.debug("{} records of {} dropped for a slow participant".format(subscription.dropped, self.topic))
+
+    def close(self):
+        """Stop reading the stream, the consumer is closed by the thread."""
+        self.closed = True
+
+    def _run(self):
+        # One consumer group per worker slot: every worker serving the competition receives the whole stream. The
+        # static membership lets a restarted worker take over the group at once, without waiting for the session
+        # of the previous consumer to expire
+        group = self.topic + '-stream-' + str(self.worker)
+        consumer = Consumer({'group.id': group, 'group.instance.id': group, 'bootstrap.servers': self.server,
+                             'auto.offset.reset': 'latest', 'enable.auto.commit': False})
+        consumer.subscribe([self.topic])
+        while not self.closed:
+            message = consumer.poll(timeout=self.poll_timeout)
+            if message is None:
+                continue
+            if message.error():
+                logging.debug("Stream {} consumer error: {}".format(self.topic, message.error()))
+                continue
+            record = message.value()
+            if self.encode is not None:
+                try:
+                    record = self.encode(record)
+                except Exception as e:
+                    logging.debug("Record of {} not encoded: {}".format(self.topic, e))
+                    continue
+            with self.lock:
+                subscriptions = list(self.subscriptions)
+            for subscription in subscriptions:
+                subscription.put(record)
+        consumer.close()
@@ -15,13 +15,25 @@
 
 
 import time
+import asyncio
+import datetime
+import threading
 import grpc
 from concurrent import futures
 import json
 import os
-from importlib.machinery import SourceFileLoader
+import logging
+
+"""
+Stream server module.
+A single gRPC server serves the participants of all the competitions: every call is routed to the servicer of its
+competition, given by the competition_id (competition code) call metadata. The servicer of a competition is created
+with its first call, and closed at the end of the competition.
+"""
 
 _ONE_DAY_IN_SECONDS = 60 * 60 * 24
+# Threads that create the servicers, out of the thread that looks up the handlers of the calls
+_LOAD_WORKERS = 4
 
 with open('config.json') as json_data_file:
     config = json.load(json_data_file)
@@ -31,6 +43,195 @@ _UPLOAD_REPO = config['UPLOAD_REPO']
 _COMPETITION_GENERATED_CODE = config['COMPETITION_GENERATED_CODE']
 
 
+def _serialized(message):
+    """Response serializer of the messages that are already serialized."""
+    return message
+
+
+# Methods of the protocol of a competition: service, method and name of the servicer method
+_METHODS = [('DataStreamer', 'sendData', 'sendData'), ('DataStreamerBatch', 'sendBatch', 'sendBatch')]
+
+
+def competition_handlers(streamer):
+    """
+    Handlers of the methods of the protocol of a competition. The streamer sends messages that are already
+    serialized, so they are not serialized again for every user.
+
+    :param streamer: DataStreamerServicer of the competition
+    :return: Dictionary of the method handlers, by full method name (/package.Service/method)
+    """
+    handlers = {}
+    for service_name, method_name, behavior in _METHODS:
+        service = streamer.protocol.service(service_name)
+        if service is None or method_name not in service.methods_by_name:
+            continue
+        method = service.methods_by_name[method_name]
+        handlers['/{}/{}'.format(service.full_name, method_name)] = grpc.stream_stream_rpc_method_handler(
+            getattr(streamer, behavior),
+            request_deserializer=streamer.protocol.descriptor_class(method.input_type).FromString,
+            response_serializer=_serialized)
+    return handlers
+
+
+_UNKNOWN = (grpc.StatusCode.INVALID_ARGUMENT, 'Unknown competition, please refer to the website')
+_OVER = (grpc.StatusCode.FAILED_PRECONDITION, 'The competition is over')
+_NOT_FOUND = (grpc.StatusCode.UNIMPLEMENTED, 'Method not found')
+
+
+def _rejection(code, details, asynchronous):
+    """Handler of the calls that can not be served, they are ended with the given status."""
+    if asynchronous:
+        async def reject(request_iterator, context):
+            await context.abort(code, details)
+    else:
+        def reject(request_iterator, context):
+            context.abort(code, details)
+    return grpc.stream_stream_rpc_method_handler(reject)
+
+
+class CompetitionRouter(grpc.GenericRpcHandler):
+    """
+    Routes the calls to the servicers of the competitions, by the competition_id call metadata.
+
+    The servicer of a competition is created with the first call of the competition, by the threads of an executor:
+    the calls of a competition that is being created wait for it in their handler, the calls of the other
+    competitions do not wait. The handlers are looked up by the thread that serves all the calls of the gRPC server
+    (the event loop with the asyncio server), which never waits for a servicer. The servicer is closed by a timer at
+    the end of the competition, its stream and its producer are released even if no call comes after the end.
+    """
+
+    def __init__(self, load_streamer, asynchronous=False):
+        """
+        :param load_streamer: Creates the servicer of a competition from its code, None if there is no such
+        competition
+        :param asynchronous: The servicers are served by the asyncio server
+        """
+        self.load_streamer = load_streamer
+        self.asynchronous = asynchronous
+        # Future of the servicer and method handlers, by competition code. The result is None for an unknown
+        # competition
+        self.competitions = {}
+        self.ended = set()
+        self.lock = threading.Lock()
+        self.executor = futures.ThreadPoolExecutor(max_workers=_LOAD_WORKERS)
+        self.unknown = _rejection(*_UNKNOWN, asynchronous)
+        self.over = _rejection(*_OVER, asynchronous)
+
+    def service(self, handler_call_details):
+        code = dict(handler_call_details.invocation_metadata).get('competition_id')
+        if code is None:
+            return self.unknown
+        with self.lock:
+            if code in self.ended:
+                return self.over
+            loaded = self.competitions.get(code)
+            if loaded is None:
+                loaded = futures.Future()
+                self.competitions[code] = loaded
+                load = True
+            else:
+                load = False
+        if load:
+            self.executor.submit(self.load, code, loaded)
+        if loaded.done():
+            return self.handler(loaded.result(), handler_call_details.method)
+        return self.deferred(loaded, handler_call_details.method)
+
+    def load(self, code, loaded):
+        """
+        Create the servicer of a competition and start the timer that closes it at the end of the competition.
+
+        :param code: Competition code
+        :param loaded: Future of the servicer and method handlers
+        """
+        try:
+            streamer = self.load_streamer(code)
+            handlers = competition_handlers(streamer) if streamer is not None else None
+        except Exception as e:
+            logging.debug("Servicer of competition {} not created: {}".format(code, e))
+            streamer = None
+        if streamer is None:
+            # The competition may be created later, the next call tries again
+            with self.lock:
+                self.competitions.pop(code, None)
+            loaded.set_result(None)
+            return
+        timer = threading.Timer(max(0.0, (streamer.end_date - datetime.datetime.now()).total_seconds()),
+                                self.close, (code,))
+        timer.daemon = True
+        timer.start()
+        loaded.set_result((streamer, handlers))
+
+    def close(self, code):
+        """Close the servicer of a competition at the end of the competition, the next calls are rejected."""
+        with self.lock:
+            loaded = self.competitions.pop(code, None)
+            self.ended.add(code)
+        if loaded is None or loaded.result() is None:
+            return
+        streamer, handlers = loaded.result()
+        try:
+            streamer.close()
+        except Exception as e:
+            logging.debug("Servicer of competition {} not closed: {}".format(code, e))
+
+    def handler(self, competition, method):
+        """
+        Handler of a call, once the servicer of its competition has been created.
+
+        :param competition: Servicer and method handlers, None if the competition is unknown
+        :param method: Full method name of the call
+        :return: Method handler, None if the competition does not have the method
+        """
+        if competition is None:
+            return self.unknown
+        streamer, handlers = competition
+        if datetime.datetime.now() > streamer.end_date:
+            return self.over
+        return handlers.get(method)
+
+    def deferred(self, loaded, method):
+        """
+        Handler of a call that arrives while the servicer of its competition is being created. The call waits for the
+        servicer in its own thread, or without blocking the event loop with the asyncio server. The requests are
+        deserialized once the servicer is known.
+
+        :param loaded: Future of the servicer and method handlers
+        :param method: Full method name of the call
+        :return: Method handler
+        """
+        if not self.asynchronous:
+            def call(request_iterator, context):
+                handler = self.handler(loaded.result(), method)
+                if handler is None:
+                    context.abort(*_NOT_FOUND)
+                # The rejections do not deserialize their requests
+                deserializer = handler.request_deserializer or _serialized
+                for response in handler.stream_stream((deserializer(request) for request in request_iterator),
+                                                      context):
+                    yield response
+            return grpc.stream_stream_rpc_method_handler(call)
+
+        async def call(request_iterator, context):
+            competition = await asyncio.wrap_future(loaded)
+            if competition is None:
+                await context.abort(*_UNKNOWN)
+            streamer, handlers = competition
+            if datetime.datetime.now() > streamer.end_date:
+                await context.abort(*_OVER)
+            handler = handlers.get(method)
+            if handler is None:
+                await context.abort(*_NOT_FOUND)
+
+            async def requests():
+                async for request in request_iterator:
+                    yield handler.request_deserializer(request)
+
+            async for response in handler.stream_stream(requests(), context):
+                yield response
+        return grpc.stream_stream_rpc_method_handler(call)
+
+
 class StreamServer:
     """
     StreamServer class. It handles the communication through gRPC/Protobuf.
@@ -47,18 +248,13 @@ class StreamServer:
             self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=100), options=options)
             self.port = server_port
 
-    def add_server(self, streamer, competition):
+    def add_router(self, router):
         """
-        Define the communication protocol, e.g. import the methods and data structures that define protocol, from the
-        files that are generated after compiling .proto file.
-        :param streamer:
-        :param competition:
+        Serve the competitions of a router.
+        :param router: CompetitionRouter
         :return:
         """
-        pb2_grpc_file_path = os.path.join(_UPLOAD_REPO, _COMPETITION_GENERATED_CODE, competition.name,
-                                          'file_pb2_grpc.py')
-        file_pb2_grpc = SourceFileLoader('file_pb2_grpc', pb2_grpc_file_path).load_module()
-        file_pb2_grpc.add_DataStreamerServicer_to_server(streamer, self.server)
+        self.server.add_generic_rpc_handlers((router,))
 
     def start_server(self):
         self.server.add_insecure_port(self.port)
@@ -72,6 +268,28 @@ class StreamServer:
             self.server.stop(None)
 
 
+class AsyncStreamServer(StreamServer):
+    """
+    StreamServer on the asyncio gRPC server (grpc.aio): the calls are coroutines on one event loop instead of threads
+    of a pool, so the number of connected users is not limited by the number of threads.
+    It has to be created in the event loop that serves it.
+    """
+
+    def __init__(self, server_port, options):
+        """
+        :param server_port:
+        :param options:
+        """
+        self.server = grpc.aio.server(options=options)
+        self.port = server_port
+
+    async def serve(self):
+        """Start the server and serve until it is stopped."""
+        self.server.add_insecure_port(self.port)
+        await self.server.start()
+        await self.server.wait_for_termination()
+
+
 if __name__ == "__main__":
 
     try:
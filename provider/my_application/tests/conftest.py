@@ -0,0 +1,49 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import importlib
+import os
+import pytest
+import sys
+
+"""
+Tests of the provider modules. The modules read config.json from the working directory, the tests are run in the
+provider/my_application directory, as the application is.
+
+    cd provider/my_application && python -m pytest tests
+
+The tests of a module are skipped if the module depends on a package that is not installed.
+"""
+
+APPLICATION_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, APPLICATION_DIRECTORY)
+os.chdir(APPLICATION_DIRECTORY)
+
+
+@pytest.fixture(scope='session')
+def producer(tmp_path_factory):
+    """
+    The producer module, skipped if one of the packages of the provider is not installed. The environment gives the
+    hosts of the services, the SQL database is a SQLite file: the module creates its repositories when it is imported.
+    """
+    for package in ['pause', 'confluent_kafka', 'apscheduler', 'pymongo', 'sqlalchemy', 'werkzeug', 'pyspark', 'grpc',
+                    'grpc_tools', 'google.protobuf', 'skmultiflow']:
+        pytest.importorskip(package)
+    environment = {'SQL_HOST': 'sqlite:///', 'SQL_DBNAME': str(tmp_path_factory.mktemp('sql') / 'scalar.db'),
+                   'KAFKA_HOST': 'localhost:9092', 'MONGO_HOST': 'localhost', 'SPARK_HOST': 'localhost',
+                   'SPARK_DRIVER_HOST': 'localhost', 'SPARK_DRIVER_PORT': '4040', 'SPARK_BLOCKMANAGER_PORT': '4041'}
+    for name, value in environment.items():
+        os.environ.setdefault(name, value)
+    return importlib.import_module('producer')
@@ -0,0 +1,99 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+
+pytest.importorskip('confluent_kafka')
+import batch_producer  # noqa: E402
+from batch_producer import BatchProducer, DeliveryReport  # noqa: E402
+
+
+class Message:
+    """Kafka message, as given to the delivery callbacks."""
+
+    def __init__(self, partition, offset):
+        self._partition = partition
+        self._offset = offset
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+
+class Producer:
+    """confluent_kafka Producer whose local queue holds queue_size messages, delivered when the producer is polled."""
+
+    def __init__(self, conf, queue_size=2):
+        self.conf = conf
+        self.queue_size = queue_size
+        self.queue = []
+        self.produced = []
+        self.polls = 0
+
+    def produce(self, topic, message, key=None, on_delivery=None):
+        if len(self.queue) >= self.queue_size:
+            raise BufferError('Local: Queue full')
+        self.queue.append((topic, message, key, on_delivery))
+
+    def poll(self, timeout=0):
+        self.polls += 1
+        served = len(self.queue)
+        for topic, message, key, on_delivery in self.queue:
+            self.produced.append((topic, message, key))
+            on_delivery(None, Message(0, len(self.produced) - 1))
+        self.queue = []
+        return served
+
+    def flush(self, timeout=None):
+        return self.poll()
+
+
+def test_delivery_report():
+    report = DeliveryReport('stream', 3)
+    report(None, Message(0, 10))
+    assert not report.done()
+    report(None, Message(1, 4))
+    report(None, Message(0, 9))
+    assert report.done()
+    assert (report.delivered, report.failed) == (3, 0)
+    assert report.offsets == {0: 10, 1: 4}
+
+
+def test_delivery_report_with_failures():
+    report = DeliveryReport('stream', 2)
+    report('Message timed out', None)
+    report(None, Message(0, 1))
+    assert report.done()
+    assert (report.delivered, report.failed) == (1, 1)
+    assert report.offsets == {0: 1}
+
+
+def test_empty_batch_is_done():
+    assert DeliveryReport('stream', 0).done()
+
+
+def test_send_batch_waits_while_the_queue_is_full(monkeypatch):
+    monkeypatch.setattr(batch_producer, 'Producer', Producer)
+    producer = BatchProducer('localhost:9092', {'linger.ms': 5})
+    assert producer.producer.conf == {'bootstrap.servers': 'localhost:9092', 'linger.ms': 5}
+    report = producer.send_batch('stream', [b'1', b'2', b'3', b'4', b'5'], keys=['1', '2', '3', '4', '5'])
+    producer.flush()
+    # No message is dropped, and the messages keep their order and their key
+    assert producer.producer.produced == [('stream', message, key) for message, key in
+                                          [(b'1', '1'), (b'2', '2'), (b'3', '3'), (b'4', '4'), (b'5', '5')]]
+    assert report.done() and report.delivered == 5
+    assert report.offsets == {0: 4}
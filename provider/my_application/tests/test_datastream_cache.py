@@ -0,0 +1,81 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gzip
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+datastream_cache = pytest.importorskip('datastream_cache')
+
+
+@pytest.fixture(autouse=True)
+def upload_repo(tmp_path, monkeypatch):
+    monkeypatch.setattr(datastream_cache, '_UPLOAD_REPO', str(tmp_path / 'uploads'))
+
+
+def _write_csv(path, text):
+    path.write_bytes(text.encode())
+    return str(path)
+
+
+def _read_compiled(content_hash):
+    with pa.memory_map(datastream_cache.cache_path(content_hash)) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def test_index_and_read_range(tmp_path):
+    file_path = _write_csv(tmp_path / 'stream.csv', 'a,b\n1,x\n2,y\n3,z\n')
+    content_hash = datastream_cache.file_content_hash(file_path)
+    row_index = datastream_cache.index_datastream(file_path, content_hash)
+    assert list(row_index) == [4, 8, 12, 16]
+    assert list(datastream_cache.load_row_index(content_hash)) == list(row_index)
+    assert list(datastream_cache.read_csv_rows(file_path, row_index, 1)) == [['2', 'y'], ['3', 'z']]
+    assert list(datastream_cache.read_csv_rows(file_path, row_index, 0, 1)) == [['1', 'x']]
+    assert list(datastream_cache.read_csv_rows(file_path, row_index, 3)) == []
+
+
+def test_index_without_last_line_end(tmp_path):
+    file_path = _write_csv(tmp_path / 'stream.csv', 'a,b\n1,x\n2,y')
+    row_index = datastream_cache.index_datastream(file_path, datastream_cache.file_content_hash(file_path))
+    assert list(datastream_cache.read_csv_rows(file_path, row_index, 1)) == [['2', 'y']]
+
+
+def test_quoted_and_compressed_files_are_not_indexed(tmp_path):
+    quoted = _write_csv(tmp_path / 'quoted.csv', 'a,b\n|1\n2|,x\n')
+    assert datastream_cache.index_datastream(quoted, datastream_cache.file_content_hash(quoted)) is None
+    compressed = str(tmp_path / 'stream.csv.gz')
+    with gzip.open(compressed, 'wt') as f:
+        f.write('a,b\n1,x\n')
+    assert datastream_cache.index_datastream(compressed, datastream_cache.file_content_hash(compressed)) is None
+
+
+def test_compile_with_profile_types(tmp_path):
+    file_path = _write_csv(tmp_path / 'stream.csv', 'a,b,c\n1,0.5,007\n2,,010\n')
+    content_hash = datastream_cache.file_content_hash(file_path)
+    profile = {'columns': {'a': {'type': 'integer'}, 'b': {'type': 'float'}, 'c': {'type': 'string'}}}
+    path = datastream_cache.compile_datastream(file_path, content_hash, profile)
+    assert path == datastream_cache.cache_path(content_hash)
+    table = _read_compiled(content_hash)
+    assert [str(field.type) for field in table.schema] == ['int64', 'double', 'string']
+    assert table.to_pydict() == {'a': [1, 2], 'b': [0.5, None], 'c': ['007', '010']}
+
+
+def test_compile_compressed_file(tmp_path):
+    file_path = str(tmp_path / 'stream.csv.gz')
+    with gzip.open(file_path, 'wt') as f:
+        f.write('a,b\n1,x\n2,y\n')
+    content_hash = datastream_cache.file_content_hash(file_path)
+    datastream_cache.compile_datastream(file_path, content_hash)
+    assert _read_compiled(content_hash).to_pydict() == {'a': ['1', '2'], 'b': ['x', 'y']}
@@ -0,0 +1,41 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+
+pytest.importorskip('skmultiflow')
+datastream_generator = pytest.importorskip('datastream_generator')
+
+
+@pytest.mark.parametrize('spec', [None, {}, {'generator': 'Unknown'}])
+def test_unknown_generator(spec):
+    with pytest.raises(ValueError, match='Unknown generator'):
+        datastream_generator.validate_generator_spec(spec)
+
+
+@pytest.mark.parametrize('n_samples', [0, -1, 2.5, '10', True, False])
+def test_invalid_number_of_samples(n_samples):
+    with pytest.raises(ValueError, match='n_samples should be a positive integer'):
+        datastream_generator.validate_generator_spec({'generator': 'SEA', 'n_samples': n_samples})
+
+
+@pytest.mark.parametrize('n_samples', [None, 1, 1000])
+def test_valid_number_of_samples(n_samples):
+    datastream_generator.validate_generator_spec({'generator': 'SEA', 'seed': 1, 'n_samples': n_samples})
+
+
+def test_invalid_generator_parameters():
+    with pytest.raises(ValueError, match='Invalid generator parameters'):
+        datastream_generator.validate_generator_spec({'generator': 'SEA', 'params': {'unknown': 1}})
@@ -0,0 +1,98 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import decimal
+import json
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+pytest.importorskip('skmultiflow')
+datastream_profile = pytest.importorskip('datastream_profile')
+
+
+def _write_csv(path, lines):
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def test_csv_types_are_lossless(tmp_path):
+    file_path = _write_csv(tmp_path / 'stream.csv', [
+        'id,code,price,ratio,name',
+        '1,007,1.50,0.5,a',
+        '2,010,2.00,1.0,b',
+        '3,100,3.25,2.5,c'])
+    profile = datastream_profile.profile_datastream(file_path)
+    types = {name: column['type'] for name, column in profile['columns'].items()}
+    # Leading zeros and trailing zeros would be lost, these columns stay strings
+    assert types == {'id': 'integer', 'code': 'string', 'price': 'string', 'ratio': 'float', 'name': 'string'}
+    assert profile['row_count'] == 3
+    assert profile['columns']['id']['classes'] == [1, 2, 3]
+    assert profile['columns']['code']['classes'] == ['007', '010', '100']
+
+
+def test_csv_integers_widen_to_floats(tmp_path):
+    lines = ['x'] + [str(i) for i in range(10)] + ['2.5']
+    profile = datastream_profile.profile_datastream(_write_csv(tmp_path / 'stream.csv', lines))
+    assert profile['columns']['x']['type'] == 'float'
+
+
+def test_csv_empty_values_do_not_decide_the_type(tmp_path):
+    profile = datastream_profile.profile_datastream(_write_csv(tmp_path / 'stream.csv', ['a,b', '1,', '2,x']))
+    assert profile['columns']['a']['type'] == 'integer'
+    assert profile['columns']['b']['type'] == 'string'
+
+
+def test_cardinality_above_max_classes(tmp_path):
+    lines = ['x'] + [str(i) for i in range(datastream_profile.MAX_CLASSES + 1)]
+    column = datastream_profile.profile_datastream(_write_csv(tmp_path / 'stream.csv', lines))['columns']['x']
+    assert column['cardinality'] == datastream_profile.MAX_CLASSES + 1
+    assert column['classes'] is None
+
+
+def test_typed_parquet_profile_is_json(tmp_path):
+    file_path = str(tmp_path / 'stream.parquet')
+    table = pa.table({
+        'released': pa.array([datetime.datetime(2020, 1, 1, 12, 30), datetime.datetime(2020, 1, 2)],
+                             pa.timestamp('us')),
+        'day': pa.array([datetime.date(2020, 1, 1), None], pa.date32()),
+        'amount': pa.array([decimal.Decimal('1.25'), decimal.Decimal('2.50')], pa.decimal128(5, 2)),
+        'payload': pa.array([b'ab', b'\xff'], pa.binary()),
+        'values': pa.array([[1, 2], [3]], pa.list_(pa.int64())),
+        'target': pa.array([0, 1], pa.int64())})
+    pq.write_table(table, file_path)
+
+    profile = datastream_profile.profile_datastream(file_path)
+    columns = profile['columns']
+    assert columns['released']['classes'] == ['2020-01-01T12:30:00', '2020-01-02T00:00:00']
+    assert columns['day']['classes'] == ['2020-01-01']
+    assert columns['amount'] == {'type': 'float', 'cardinality': 2, 'classes': [1.25, 2.5]}
+    assert columns['payload']['classes'] == ['ab', '�']
+    assert columns['values']['classes'] is None
+    assert columns['target']['classes'] == [0, 1]
+    # The profile is stored with the datastream as json
+    assert json.loads(json.dumps(profile)) == profile
+
+
+def test_typed_parquet_datastream_is_stored(tmp_path):
+    pytest.importorskip('sqlalchemy')
+    competition_repository = pytest.importorskip('repositories.CompetitionRepository')
+    file_path = str(tmp_path / 'stream.parquet')
+    pq.write_table(pa.table({'released': pa.array([datetime.datetime(2020, 1, 1)], pa.timestamp('us')),
+                             'amount': pa.array([decimal.Decimal('1.25')], pa.decimal128(5, 2))}), file_path)
+    profile = datastream_profile.profile_datastream(file_path)
+    datastream = competition_repository.Datastream(None, name='typed', description='', file_path='stream.parquet',
+                                                   profile=profile)
+    assert datastream.get_profile() == profile
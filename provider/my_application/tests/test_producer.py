@@ -0,0 +1,218 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import copy
+import csv
+import datetime
+import orjson
+import types
+import pytest
+from release_scheduler import ReleaseScheduler
+
+datastream_cache = pytest.importorskip('datastream_cache')
+
+
+@pytest.fixture
+def datastream(producer, tmp_path, monkeypatch):
+    """.csv datastream with two empty rows, at positions 12 and 13: they are left out of the compiled datastream."""
+    file_path = str(tmp_path / 'stream.csv')
+    with open(file_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['a', 'target'])
+        for i in range(30):
+            writer.writerow([i, i % 3] if i not in (12, 13) else [])
+    datastream = types.SimpleNamespace(file_path=file_path, content_hash=datastream_cache.file_content_hash(file_path),
+                                       get_profile=lambda: None)
+    monkeypatch.setattr(datastream_cache, '_UPLOAD_REPO', str(tmp_path / 'uploads'))
+    monkeypatch.setattr(producer._DATASTREAM_REPO, 'get_datastream_by_id', lambda datastream_id: datastream)
+    monkeypatch.setattr(producer, '_UPLOAD_REPO', '')
+    monkeypatch.setattr(producer, '_STREAM_REPO', '')
+    return datastream
+
+
+def _competition():
+    return types.SimpleNamespace(competition_id=3, datastream_id=1, initial_batch_size=10, batch_size=4)
+
+
+def _first_rows(producer, cursor):
+    initial_batch, batches = producer.read_csv_file(_competition(), {'target': ['MAPE']}, cursor=cursor)
+    return [group[0]['a'] for group, train_group, position in batches][:2]
+
+
+def test_new_stream_saves_its_source(producer, datastream):
+    cursor = producer.ReleaseCursor(3)
+    assert _first_rows(producer, cursor) == ['10', '16']
+    assert cursor.source == producer._FILE_SOURCE
+    datastream_cache.compile_datastream(datastream.file_path, datastream.content_hash)
+    cursor = producer.ReleaseCursor(3)
+    assert _first_rows(producer, cursor) == ['10', '16']
+    assert cursor.source == producer._COMPILED_SOURCE
+
+
+def test_resume_from_the_saved_source(producer, datastream):
+    datastream_cache.compile_datastream(datastream.file_path, datastream.content_hash)
+    # Row 14 is at position 14 in the file, and at position 12 in the compiled datastream
+    saved = {'batch_index': 0, 'row_index': 14, 'row_id': 13, 'source': producer._FILE_SOURCE}
+    cursor = producer.ReleaseCursor(3, saved=saved)
+    assert _first_rows(producer, cursor) == ['14', '18']
+    assert cursor.source == producer._FILE_SOURCE
+    saved.update(row_index=12, source=producer._COMPILED_SOURCE)
+    assert _first_rows(producer, producer.ReleaseCursor(3, saved=saved)) == ['14', '18']
+
+
+def test_resume_without_the_compiled_datastream(producer, datastream):
+    saved = {'batch_index': 0, 'row_index': 12, 'row_id': 13, 'source': producer._COMPILED_SOURCE}
+    assert _first_rows(producer, producer.ReleaseCursor(3, saved=saved)) == []
+
+
+class Repository:
+    """MongoRepository of the release cursors."""
+
+    def __init__(self):
+        self.cursors = {}
+
+    def save_release_cursor(self, competition_id, cursor):
+        self.cursors[competition_id] = dict(cursor)
+
+    def get_release_cursor(self, competition_id):
+        return self.cursors.get(competition_id)
+
+
+def _report(delivered, failed=0):
+    """Delivery report of a train group of delivered + failed messages, all of them reported."""
+    from batch_producer import DeliveryReport
+    report = DeliveryReport('stream', delivered + failed)
+    report.delivered, report.failed = delivered, failed
+    return report
+
+
+def test_cursor_moves_after_delivered_batches(producer):
+    repository = Repository()
+    cursor = producer.ReleaseCursor(3, repository)
+    cursor.release(_report(4), 0, 14, 15, lag=0.5)
+    pending = _report(0)
+    pending.size = 4
+    cursor.release(pending, 1, 18, 19, lag=0.1)
+    cursor.track([])
+    assert (cursor.batch_index, cursor.row_index, cursor.row_id) == (0, 14, 15)
+    cursor.finish()
+    saved = repository.get_release_cursor(3)
+    assert saved['finished'] and saved['row_index'] == 14
+    assert saved['release_lag']['batches'] == 1 and saved['release_lag']['max'] == 0.5
+
+
+def test_cursor_stops_at_a_failed_batch(producer):
+    repository = Repository()
+    cursor = producer.ReleaseCursor(3, repository)
+    cursor.release(_report(4), 0, 14, 15)
+    cursor.release(_report(3, failed=1), 1, 18, 19)
+    cursor.release(_report(4), 2, 22, 23)
+    cursor.track([])
+    assert (cursor.batch_index, cursor.row_index, cursor.row_id) == (0, 14, 15)
+    cursor.finish()
+    # The batches after the last one delivered are released again when the stream is resumed
+    resumed = producer.ReleaseCursor.load(3, repository)
+    assert resumed.resumed and not resumed.finished
+    assert (resumed.batch_index, resumed.row_index, resumed.row_id) == (0, 14, 15)
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the scheduler sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class BatchProducer:
+    """BatchProducer that records the messages it publishes, every batch is delivered at once."""
+
+    def __init__(self):
+        self.messages = []
+
+    def send_batch(self, topic, messages, keys=None):
+        from batch_producer import DeliveryReport
+        self.messages.extend((topic, message) for message in messages)
+        report = DeliveryReport(topic, len(messages))
+        report.delivered = len(messages)
+        return report
+
+    def poll(self, timeout=0):
+        return 0
+
+    def flush(self, timeout=None):
+        return 0
+
+
+def _baseline_messages(topic, initial_batch, items, predictions, batch_size, predictions_time_interval,
+                       spark_topic, competition_id, released_ats):
+    """
+    Messages published by the producer before the releases were batched: every row was serialized and sent on its
+    own, with the fields of its group added to it.
+    """
+    from bson import json_util
+    messages = [(topic, orjson.dumps(item)) for item in initial_batch]
+    test_groups = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    train_groups = [predictions[i:i + batch_size] for i in range(0, len(predictions), batch_size)]
+    for group, train_group, released_at in zip(test_groups, train_groups, released_ats):
+        for item in group:
+            item['tag'] = 'TEST'
+            item['Deadline'] = str(released_at + datetime.timedelta(seconds=int(predictions_time_interval)))
+            item['Released'] = str(released_at)
+            item['competition_id'] = str(competition_id)
+            messages.append((topic, orjson.dumps(item)))
+        for item in train_group:
+            deadline = released_at + datetime.timedelta(seconds=int(predictions_time_interval))
+            item['Deadline'] = deadline.strftime("%Y-%m-%d %H:%M:%S")
+            item['Released'] = released_at.strftime("%Y-%m-%d %H:%M:%S")
+            item['competition_id'] = competition_id
+            messages.append((spark_topic, orjson.dumps(item)))
+        for item in train_group:
+            item['tag'] = 'TRAIN'
+            item['Deadline'] = released_at + datetime.timedelta(seconds=int(predictions_time_interval))
+            item['Released'] = released_at
+            messages.append((topic, orjson.dumps(item, default=json_util.default)))
+    return messages
+
+
+def test_batched_messages_match_the_baseline(producer, monkeypatch):
+    clock = FakeClock()
+    released_ats = [datetime.datetime(2020, 1, 1, 12, 0, 0, 250000) + datetime.timedelta(seconds=10 * i)
+                    for i in range(3)]
+    now = iter(released_ats)
+    # The releases do not wait, every group is released at the next instant of released_ats
+    monkeypatch.setattr(producer, 'ReleaseScheduler', lambda: ReleaseScheduler(clock, clock.sleep))
+    monkeypatch.setattr(producer, 'datetime', types.SimpleNamespace(
+        datetime=types.SimpleNamespace(now=lambda: next(now)), timedelta=datetime.timedelta))
+    monkeypatch.setattr(producer.time, 'sleep', lambda seconds: None)
+
+    initial_batch = [{'tag': 'INIT', 'rowID': 1, 'a': '0.5', 'b': 'x', 'target': '1'}]
+    items = [{'rowID': row_id, 'a': str(row_id / 4), 'b': 'é' * row_id} for row_id in range(2, 8)]
+    predictions = [{'rowID': row_id, 'target': str(row_id % 2)} for row_id in range(2, 8)]
+    batches = [(items[i:i + 2], predictions[i:i + 2], i + 2) for i in range(0, len(items), 2)]
+
+    competition_producer = producer.CompetitionProducer.__new__(producer.CompetitionProducer)
+    competition_producer.producer = BatchProducer()
+    competition_producer.main('stream', copy.deepcopy(initial_batch), copy.deepcopy(batches), 1, 5, 3,
+                              'streamspark_train', 7)
+
+    expected = _baseline_messages('stream', copy.deepcopy(initial_batch), copy.deepcopy(items),
+                                  copy.deepcopy(predictions), 2, 3, 'streamspark_train', 7, released_ats)
+    assert competition_producer.producer.messages == expected
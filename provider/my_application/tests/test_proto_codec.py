@@ -0,0 +1,81 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+
+pytest.importorskip('google.protobuf')
+from google.protobuf import descriptor_pb2, descriptor_pool, json_format, message_factory  # noqa: E402
+from proto_codec import MessageCodec, repeated_messages  # noqa: E402
+
+
+def _message_classes():
+    """Message and MessageBatch classes of a competition protocol, built from their descriptor."""
+    file_proto = descriptor_pb2.FileDescriptorProto(name='codec_test.proto', package='codec_test', syntax='proto3')
+    message = file_proto.message_type.add(name='Message')
+    field_type = descriptor_pb2.FieldDescriptorProto
+    for number, (name, type_) in enumerate([('rowID', field_type.TYPE_INT32), ('deadline', field_type.TYPE_STRING),
+                                            ('value', field_type.TYPE_FLOAT), ('ratio', field_type.TYPE_DOUBLE),
+                                            ('flag', field_type.TYPE_BOOL)], 1):
+        message.field.add(name=name, number=number, type=type_, label=field_type.LABEL_OPTIONAL)
+    message.field.add(name='history', number=6, type=field_type.TYPE_INT64, label=field_type.LABEL_REPEATED)
+    batch = file_proto.message_type.add(name='MessageBatch')
+    batch.field.add(name='messages', number=1, type=field_type.TYPE_MESSAGE, label=field_type.LABEL_REPEATED,
+                    type_name='.codec_test.Message')
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file_proto)
+    descriptors = [pool.FindMessageTypeByName('codec_test.' + name) for name in ('Message', 'MessageBatch')]
+    if hasattr(message_factory, 'GetMessageClass'):
+        return [message_factory.GetMessageClass(descriptor) for descriptor in descriptors]
+    factory = message_factory.MessageFactory(pool)
+    return [factory.GetPrototype(descriptor) for descriptor in descriptors]
+
+
+Message, MessageBatch = _message_classes()
+
+
+def test_parse_converts_the_values():
+    codec = MessageCodec(Message)
+    message = codec.parse({'rowID': '7', 'deadline': 12, 'value': 1, 'ratio': '0.5', 'flag': True, 'history': [1, 2],
+                           'unknown': 'x', 'target': None})
+    assert (message.rowID, message.deadline, message.value, message.ratio, message.flag) == (7, '12', 1.0, 0.5, True)
+    assert list(message.history) == [1, 2]
+
+
+def test_parse_like_json_format():
+    codec = MessageCodec(Message)
+    values = {'rowID': 3.0, 'deadline': '2020-01-01 00:00:00', 'ratio': 2, 'flag': False}
+    expected = json_format.ParseDict(values, Message())
+    assert codec.parse(values) == expected
+
+
+def test_parse_invalid_value():
+    with pytest.raises(json_format.ParseError):
+        MessageCodec(Message).parse({'rowID': 'seven'})
+
+
+def test_to_dict():
+    codec = MessageCodec(Message)
+    message = Message(rowID=7, value=0.1, history=[3])
+    document = codec.to_dict(message)
+    # The scalar fields are always present, float fields are written as json_format writes them
+    assert document == {'rowID': 7, 'deadline': '', 'value': 0.1, 'ratio': 0.0, 'flag': False, 'history': ['3']}
+    assert document['value'] == json_format.MessageToDict(message)['value']
+
+
+def test_repeated_messages():
+    messages = [Message(rowID=i, deadline='d' * i) for i in (1, 200)]
+    batch = MessageBatch.FromString(repeated_messages([message.SerializeToString() for message in messages]))
+    assert list(batch.messages) == messages
+    assert MessageBatch.FromString(repeated_messages([])) == MessageBatch()
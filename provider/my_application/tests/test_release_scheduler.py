@@ -0,0 +1,86 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+from release_scheduler import ReleaseScheduler, TokenBucket, parse_release_rate
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the scheduler sleeps or the test advances it."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_release_instants_do_not_drift():
+    clock = FakeClock()
+    schedule = ReleaseScheduler(clock, clock.sleep)
+    for index in range(1, 4):
+        # Publishing a batch takes time, the next release instant stays the same
+        clock.now += 0.3
+        assert schedule.wait_until(index * 1.0) == 0.0
+        assert clock.now == pytest.approx(100.0 + index)
+
+
+def test_late_release_lag():
+    clock = FakeClock()
+    schedule = ReleaseScheduler(clock, clock.sleep)
+    clock.now += 2.5
+    assert schedule.wait_until(1.0) == pytest.approx(1.5)
+    assert schedule.wait_until(3.0) == 0.0
+    assert schedule.count == 2
+    assert schedule.max_lag == pytest.approx(1.5)
+    assert schedule.mean_lag() == pytest.approx(0.75)
+
+
+def test_train_waits_are_not_recorded():
+    clock = FakeClock()
+    schedule = ReleaseScheduler(clock, clock.sleep)
+    clock.now += 5.0
+    assert schedule.wait_until(1.0, record=False) == pytest.approx(4.0)
+    assert schedule.count == 0
+    assert schedule.mean_lag() == 0.0
+    schedule.record(0.5)
+    assert (schedule.count, schedule.max_lag) == (1, 0.5)
+
+
+def test_token_bucket_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(100, burst=0.05, clock=clock)
+    assert bucket.take() == 1
+    assert bucket.wait_time() == pytest.approx(0.01)
+    clock.now += 0.025
+    assert bucket.take() == 2
+    # The bucket does not hold more than its burst capacity
+    clock.now += 10
+    assert bucket.take() == 5
+    assert bucket.take() == 0
+
+
+@pytest.mark.parametrize('release_rate, expected', [(None, None), ('', None), (5, 5.0), ('0.5', 0.5), (1e3, 1000.0)])
+def test_parse_release_rate(release_rate, expected):
+    assert parse_release_rate(release_rate) == expected
+
+
+@pytest.mark.parametrize('release_rate', [0, -1, '0', 'fast', 'nan', float('inf'), True, [5], {'rate': 5}])
+def test_invalid_release_rate(release_rate):
+    with pytest.raises(ValueError, match='The release rate must be'):
+        parse_release_rate(release_rate)
@@ -0,0 +1,66 @@
+# Copyright 2020 Nedeljko Radulovic, Dihia Boulegane, Albert Bifet
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import threading
+import pytest
+
+pytest.importorskip('confluent_kafka')
+from stream_hub import AsyncSubscription, Subscription  # noqa: E402
+
+
+def test_oldest_records_are_dropped():
+    subscription = Subscription(3)
+    for record in range(5):
+        subscription.put(record)
+    assert subscription.dropped == 2
+    assert subscription.get(timeout=0) == 2
+    assert subscription.get_many(10, timeout=0) == [3, 4]
+    assert subscription.get(timeout=0) is None
+    assert subscription.get_many(10, timeout=0) == []
+
+
+def test_get_many_takes_at_most_max_count():
+    subscription = Subscription(10)
+    for record in range(5):
+        subscription.put(record)
+    assert subscription.get_many(2) == [0, 1]
+    assert subscription.get_many(5) == [2, 3, 4]
+
+
+def test_get_waits_for_a_record():
+    subscription = Subscription(3)
+    timer = threading.Timer(0.05, subscription.put, args=('record',))
+    timer.start()
+    assert subscription.get(timeout=5) == 'record'
+    timer.join()
+
+
+def test_async_subscription():
+    async def receive():
+        subscription = AsyncSubscription(2, asyncio.get_running_loop())
+        assert await subscription.get_async(timeout=0.01) is None
+        # Records put by the thread of the stream consumer wake up the coroutine
+        timer = threading.Timer(0.05, lambda: [subscription.put(record) for record in range(3)])
+        timer.start()
+        records = await subscription.get_many_async(10, timeout=5)
+        timer.join()
+        records += await subscription.get_many_async(10, timeout=0.01)
+        return records, subscription.dropped
+
+    records, dropped = asyncio.run(receive())
+    # The first record may have been taken before the others were put
+    assert records in ([1, 2], [0, 1, 2])
+    assert dropped == (1 if records == [1, 2] else 0)
@@ -25,10 +25,10 @@ from functools import wraps
 from flask_mail import Mail, Message
 from gevent.pywsgi import WSGIServer
 import json
+import threading
 import os
 import os.path
 from werkzeug.utils import secure_filename
-from grpc_tools import protoc
 from repositories.CompetitionRepository import CompetitionRepository, Competition, Datastream, DatastreamRepository, \
     User, UserRepository, Subscription, SubscriptionRepository
 from repository import MongoRepository
@@ -41,6 +41,14 @@ from werkzeug.datastructures import Headers
 from hashids import Hashids
 import eventlet
 from random import randint
+from multiprocessing import Process
+from datastream_cache import file_content_hash, compile_datastream, COMPRESSED_EXTENSIONS
+from datastream_profile import profile_datastream
+from datastream_generator import validate_generator_spec
+from release_scheduler import parse_release_rate
+from competition_proto import compile_competition_proto, BATCH_PROTO_FILE
+from stream_auth import SUBSCRIPTION_EVENTS_TOPIC, subscription_deleted_event
+from confluent_kafka import Producer
 eventlet.monkey_patch(time=True)
 logging.basicConfig(level='INFO')
 
@@ -65,6 +73,8 @@ app.debug = True
 # Start scheduler
 _SCHEDULER = Scheduler()
 _SCHEDULER.start()
+# Resume the streams of the competitions that were running
+_SCHEDULER.resume_competitions()
 
 
 def generate_confirmation_token(email):
@@ -93,6 +103,63 @@ def code_generator(competition_id):
     return hashids.encode(competition_id)
 
 
+def prepare_datastream(datastream_id, ds_path, compiled=False):
+    """
+    Profile the datastream file and, for a .csv file, hash it, index it and compile it into an Arrow IPC file. The
+    content hash and the profile are then stored with the datastream. It runs in a background process started by
+    start_datastream_preparation, a competition that starts before it is done parses the file itself.
+
+    :param datastream_id: Datastream ID
+    :param ds_path: Path to the datastream file
+    :param compiled: The datastream is compiled (.csv files)
+    :return:
+    """
+    profile = profile_datastream_file(ds_path)
+    content_hash = None
+    if compiled:
+        try:
+            content_hash = file_content_hash(ds_path)
+            compile_datastream(ds_path, content_hash, profile)
+        except Exception as e:
+            logging.debug("Datastream {} not compiled: {}".format(ds_path, e))
+    try:
+        DatastreamRepository(_SQL_HOST, _SQL_DBNAME).set_datastream_profile(datastream_id, content_hash, profile)
+    except Exception as e:
+        logging.debug("Profile of datastream {} not stored: {}".format(datastream_id, e))
+
+
+def start_datastream_preparation(datastream_id, ds_path, compiled=False):
+    """
+    Start prepare_datastream in a background process, so the upload request does not wait for it. The process is
+    joined by a watcher thread once it is done.
+
+    :param datastream_id: Datastream ID
+    :param ds_path: Path to the datastream file
+    :param compiled: The datastream is compiled (.csv files)
+    :return:
+    """
+    process = Process(target=prepare_datastream, args=(datastream_id, ds_path, compiled))
+    process.daemon = True
+    process.start()
+    watcher = threading.Thread(target=process.join)
+    watcher.daemon = True
+    watcher.start()
+
+
+def profile_datastream_file(ds_path):
+    """
+    Profile the datastream file: row count, type, cardinality and classes of the columns.
+
+    :param ds_path: Path to the datastream file
+    :return: Profile dictionary, None if the file could not be profiled
+    """
+    try:
+        return profile_datastream(ds_path)
+    except Exception as e:
+        logging.debug("Datastream {} not profiled: {}".format(ds_path, e))
+        return None
+
+
 jinja_options = app.jinja_options.copy()
 jinja_options.update(dict(
     block_start_string='<%',
@@ -119,12 +186,19 @@ try:
 except Exception:
     _MONGO_HOST = config['MONGO_HOST']
 
+try:
+    _KAFKA_HOST = os.environ['KAFKA_HOST']
+except Exception:
+    _KAFKA_HOST = config['KAFKA_HOST']
+
 
 _COMPETITION_REPO = CompetitionRepository(_SQL_HOST, _SQL_DBNAME)
 _DATASTREAM_REPO = DatastreamRepository(_SQL_HOST, _SQL_DBNAME)
 _USER_REPO = UserRepository(_SQL_HOST, _SQL_DBNAME)
 _SUBSCRIPTION_REPO = SubscriptionRepository(_SQL_HOST, _SQL_DBNAME)
 _MONGO_REPO = MongoRepository(_MONGO_HOST)
+# Notifies the gRPC workers of the deleted subscriptions, they are removed from their credential caches
+_SUBSCRIPTION_EVENTS_PRODUCER = Producer({'bootstrap.servers': _KAFKA_HOST})
 
 # Standard evaluation measures, should be written in MongoDB if they don't exist there already
 standard_measures = [{'id': 1, 'name': 'MAPE', 'type': 'regression'}, {'id': 2, 'name': 'MSE', 'type': 'regression'},
@@ -153,6 +227,7 @@ if _DATASTREAM_REPO.get_datastream_by_id(1) is None:
     datastream = Datastream(1, name="Test", file_path=data_file_name, description="Datastream for test")
     _DATASTREAM_REPO.insert_one(datastream)
     _DATASTREAM_REPO.session.commit()
+    start_datastream_preparation(1, ds_path, compiled=True)
 ############################
 "Create a test competition"
 create_test_competition = True
@@ -180,18 +255,8 @@ if create_test_competition:
 
     copy("file.proto", proto_directory)
 
-    if not os.path.exists(generated_code_directory):
-        os.makedirs(generated_code_directory)
-    try:
-        with open(generated_code_directory + '/__init__.py', "w+") as f:
-            f.write('')
-    except Exception:
-        pass
-
     try:
-        protoc.main(('', '-I' + proto_directory, '--python_out=' + generated_code_directory,
-                    '--grpc_python_out=' + generated_code_directory,
-                    os.path.join(proto_directory, 'file.proto')))
+        compile_competition_proto(proto_directory, generated_code_directory)
     except Exception as e:
         print(str(e))
     competition_config = {"target": ["MAPE"]}
@@ -379,8 +444,9 @@ def competitions():
     - Competition settings: size of initial batch, initial training time, size of a regular batch,
     time interval between the batches, name of the label column and the evaluation
     metric, start and end date, time interval to send the predictions, .proto file
+    - Optionally, release rate of the stream in records per second
 
-    :return: Responses: {200: If method== "GET", return the list of the competitions, If method == "POST", confirm success, 500: Error}
+    :return: Responses: {200: If method== "GET", return the list of the competitions, If method == "POST", confirm success, 400: Invalid release rate, 500: Error}
     """
     if request.method == 'GET':
         status = request.args.get('status')
@@ -417,6 +483,11 @@ def competitions():
         end_date = data['end_date'].replace('T', ' ').replace('Z', '')
         predictions_time_interval = data['predictions_time_interval']
         description = data['description']
+        # Optional: release the stream at a rate (records per second) instead of one batch every time interval
+        try:
+            release_rate = parse_release_rate(data.get('release_rate'))
+        except ValueError as e:
+            return json.dumps({'error': True, 'message': str(e)}), 400, {'ContentType': 'application/json'}
 
         data_file = request.files['file']
         file_name = data_file.filename
@@ -435,19 +506,8 @@ def competitions():
             data_file.save(os.path.join(proto_directory, 'file.proto'))
             generated_code_directory = os.path.join(config['UPLOAD_REPO'], config['COMPETITION_GENERATED_CODE'], name)
 
-            if not os.path.exists(generated_code_directory):
-                os.makedirs(generated_code_directory)
-
-            try:
-                with open(generated_code_directory + '/__init__.py', "w+") as f:
-                    f.write('')
-            except Exception:
-                pass
-
             try:
-                protoc.main(('', '-I' + proto_directory, '--python_out=' + generated_code_directory,
-                             '--grpc_python_out=' + generated_code_directory,
-                             os.path.join(proto_directory, 'file.proto')))
+                compile_competition_proto(proto_directory, generated_code_directory)
             except Exception as e:
                 print(str(e))
 
@@ -456,7 +516,8 @@ def competitions():
                                   initial_training_time=initial_training_time, batch_size=batch_size,
                                   time_interval=time_interval, target_class=target_class, start_date=start_date,
                                   file_path=file_name, predictions_time_interval=predictions_time_interval,
-                                  end_date=end_date, description=description, code=code)
+                                  end_date=end_date, description=description, code=code,
+                                  release_rate=release_rate)
 
         _COMPETITION_REPO.insert_one(competition)
         code = code_generator(competition.competition_id)
@@ -494,9 +555,9 @@ def get_datastreams():
     Parameters:
     - Dataset name
     - Dataset description
-    - Dataset file
+    - Dataset file, or the specification of a generator ("generator" field, see datastream_generator)
 
-    :return: Responses: {If method == "GET": return the list of the datasets, If method == "POST": {200: confirm success, 500: Error}
+    :return: Responses: {If method == "GET": return the list of the datasets, If method == "POST": {200: confirm success, 400: Invalid generator, 500: Error}
     """
     if request.method == 'GET':
         status = request.args.get('status')
@@ -517,10 +578,28 @@ def get_datastreams():
         data = data['datastream']
         data = data[0]
         data = json.loads(data)
-        data_file = request.files['file']
         name = data['name']
         description = data['description']
-        file_name = data_file.filename
+        generator = data.get('generator')
+        if generator is not None:
+            # Synthetic datastream: the specification of the generator is stored in place of the datastream file
+            try:
+                validate_generator_spec(generator)
+            except ValueError as e:
+                logging.debug("Invalid generator: {}".format(e))
+                return json.dumps({'error': True, 'message': str(e)}), 400, {'ContentType': 'application/json'}
+            data_directory = os.path.join(config['UPLOAD_REPO'], config['STREAM_DATA_FILE'])
+            data_file_name = name + '.gen'
+            ds_path = os.path.join(data_directory, data_file_name)
+            if not os.path.exists(data_directory):
+                os.makedirs(data_directory)
+            with open(ds_path, 'w') as f:
+                json.dump(generator, f)
+            data_file = None
+            file_name = data_file_name
+        else:
+            data_file = request.files['file']
+            file_name = data_file.filename
         # Check if the file is one of the allowed types/extensions
         if data_file and allowed_file(file_name):
             # Make the filename safe, remove unsupported chars
@@ -536,6 +615,10 @@ def get_datastreams():
 
         datastream = Datastream(None, name=name, file_path=data_file_name, description=description)
         _DATASTREAM_REPO.insert_one(datastream)
+        if datastream.datastream_id is not None:
+            # The file is profiled in the background. Columnar files are read directly, only .csv files are compiled
+            start_datastream_preparation(datastream.datastream_id, ds_path,
+                                         compiled=get_file_extension(file_name).startswith('.csv'))
 
         return json.dumps({'success': True}), 200, {'ContentType': 'application/json'}
 
@@ -566,6 +649,19 @@ def results_by_user_by_competition(competition_id):
     return jsonify(results)
 
 
+@app.route('/api/release_lag/<competition_id>')
+def release_lag_by_competition(competition_id):
+    """
+    Retrieve the release lag of the stream of a given competition: how late the batches have been released with
+    respect to their release instants.
+
+    :param competition_id: Competition id
+    :return: Number of batches delivered, mean, max and last release lag in seconds, index of the last batch
+    """
+    release_lag = _MONGO_REPO.get_release_lag(competition_id)
+    return jsonify(release_lag)
+
+
 @app.route('/api/subscriptions', methods=['POST'])
 def subscriptions():
     """
@@ -609,6 +705,9 @@ def delete_subscription():
             # insert subscriptions
             subscription = _SUBSCRIPTION_REPO.get_subscription(competition.competition_id, user.user_id)
             _SUBSCRIPTION_REPO.delete_one(subscription)
+            _SUBSCRIPTION_EVENTS_PRODUCER.produce(SUBSCRIPTION_EVENTS_TOPIC,
+                                                  subscription_deleted_event(competition.competition_id, user.user_id))
+            _SUBSCRIPTION_EVENTS_PRODUCER.poll(0)
     except Exception as e:
         print(str(e))
 
@@ -754,7 +853,8 @@ def get_competition_golden_standard(competition_id):
 
 
 # These are the extension that we are accepting to be uploaded
-app.config['ALLOWED_EXTENSIONS'] = {'csv', 'xls', 'proto'}
+app.config['ALLOWED_EXTENSIONS'] = {'csv', 'xls', 'proto', 'parquet', 'arrow', 'feather', 'csv.gz', 'csv.bz2',
+                                    'csv.zst'}
 
 
 def allowed_file(filename):
@@ -765,16 +865,19 @@ def allowed_file(filename):
     :return: True/False
     """
     return '.' in filename and \
-           filename.rsplit('.', 1)[1] in app.config['ALLOWED_EXTENSIONS']
+           get_file_extension(filename)[1:] in app.config['ALLOWED_EXTENSIONS']
 
 
 def get_file_extension(filename):
     """
-    Get the extension of the file.
+    Get the extension of the file. For compressed files the extension includes the one of the compressed file,
+    e.g. '.csv.gz'.
     :param filename:
     :return:
     """
     file_name, extension = os.path.splitext(filename)
+    if extension in COMPRESSED_EXTENSIONS:
+        extension = os.path.splitext(file_name)[1] + extension
     return extension
 
 
@@ -896,6 +999,27 @@ def download_proto_file(competition_id):
         return json.dumps('no File'), 404, {'ContentType': 'application/json'}
 
 
+@app.route("/download/batch_proto/<competition_id>")
+def download_batch_proto_file(competition_id):
+    """
+    Download the proto file of the batch protocol (sendBatch) for a given competition. It imports the proto file of
+    the competition.
+    :param competition_id: Competition ID
+    :return: Responses: {.proto file, 404: File not found}
+
+    """
+    competition = _COMPETITION_REPO.get_competition_by_id(competition_id)
+    if competition is None:
+        return json.dumps('Competition not found !, please check'), 404, {'ContentType': 'application/json'}
+    try:
+        path = os.path.join(config['UPLOAD_REPO'], config['COMPETITION_PROTO_REPO'], competition.name,
+                            BATCH_PROTO_FILE)
+        return send_file(path, as_attachment=True)
+    except Exception as e:
+        print(str(e))
+        return json.dumps('no File'), 404, {'ContentType': 'application/json'}
+
+
 if __name__ == '__main__':
     http_server = WSGIServer(('', 5000), app)
     http_server.serve_forever()